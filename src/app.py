@@ -13,10 +13,11 @@ the display and buttons, and defines the layout of the calculator.
 """
 
 import tkinter as tk
-from tkinter import font
-from math_logic import evaluate_expression
+from math_logic import ERROR_TIMEOUT, EvaluationBudget, IncrementalEvaluator
+from expression_buffer import ExpressionBuffer, sanitize_pasted
+from result_cache import ResultCache
+from worker import EvaluationWorker
 import config
-from tkinter import messagebox
 
 
 class CalculatorApp:
@@ -26,27 +27,48 @@ class CalculatorApp:
     as well as the logic for button clicks and expression evaluation.
 
     Attributes:
-        display (tk.Entry): The tkinter Entry widget used for displaying the current expression.
+        display (tk.Entry): The read-only tkinter Entry widget displaying the current expression.
+        preview (tk.Label): The label showing the live result of the current expression.
+        evaluator (IncrementalEvaluator): Evaluates the expression incrementally while it is typed.
+        worker (EvaluationWorker): Evaluates the expression in the background when '=' is pressed.
         window (tk.Tk): The main tkinter window of the application.
-        current_expression (str): The current mathematical expression entered by the user.
+        expression (ExpressionBuffer): The current mathematical expression entered by the user.
     """
 
-    def __init__(self):
-        """ Initialize the CalculatorApp with a main window and layout configurations. """
+    def __init__(self, use_cache=config.RESULT_CACHE_ENABLED):
+        """ Initialize the CalculatorApp with a main window and layout configurations.
+
+        Args:
+            use_cache (bool, optional): Whether results of slow evaluations are looked up
+                in and stored to the persistent result cache.
+        """
         self.display = None
+        self.preview = None
+        self.evaluator = IncrementalEvaluator(EvaluationBudget(max_seconds=config.PREVIEW_TIME_BUDGET,
+                                                               approximate=True))
+        # Started first, so the worker process is ready by the time the window is shown
+        cache = ResultCache(min_seconds=config.RESULT_CACHE_MIN_SECONDS, max_bytes=config.RESULT_CACHE_MAX_BYTES,
+                            enabled=use_cache)
+        self.worker = EvaluationWorker(cache)
+        self.worker.start()
         self.window = tk.Tk()
         self.window.title(config.APP_TITLE)
         self.window.geometry(config.APP_RESOLUTION)
-        self.current_expression = ""
+        self.expression = ExpressionBuffer()
+        # Whether a redraw of the display is scheduled, see update_display
+        self._render_pending = False
         self.create_display_frame()
         self.create_buttons_frame()
         self.bind_keyboard_events()
     
     def show_help(self):
+        from tkinter import messagebox
+
         messagebox.showinfo("Help", "Calculator Usage Instructions:\n\n"
                                     "Use the numeric keys to enter values.\n"
                                     "Press 'AC' to clear the display.\n"
                                     "Press 'DEL' to delete the last entry.\n"
+                                    "Paste an expression with Ctrl+V.\n"
                                     "To use the square root, press '√' followed by the number (e.g., '√9').\n"
                                     "To calculate an nth root, type the degree followed by '√' and the number (e.g., '3√8').\n"
                                     "If no number precedes '√', it defaults to square root.\n"
@@ -54,10 +76,15 @@ class CalculatorApp:
 
     def create_display_frame(self):
         """ Creates the display area where the calculation expression is shown. """
+        # Read-only, so only the buttons, key bindings and paste edit the expression
         self.display = tk.Entry(self.window, font=config.DIGITS_FONT_STYLE, bg=config.DISPLAY_COLOR, justify=tk.RIGHT,
-                                borderwidth=0)
+                                readonlybackground=config.DISPLAY_COLOR, borderwidth=0, state='readonly')
         self.display.grid(row=0, column=0, columnspan=4, sticky="nsew")
 
+        self.preview = tk.Label(self.window, font=config.PREVIEW_FONT_STYLE, bg=config.DISPLAY_COLOR,
+                                fg=config.PREVIEW_TEXT_COLOR, anchor=tk.E)
+        self.preview.grid(row=1, column=0, columnspan=4, sticky="nsew")
+
         self.window.grid_rowconfigure(0, weight=1)
         for i in range(4):
             self.window.grid_columnconfigure(i, weight=1)
@@ -65,8 +92,8 @@ class CalculatorApp:
     def create_buttons_frame(self):
         """ Creates the button layout for the calculator. """
         buttons_frame = tk.Frame(self.window)
-        buttons_frame.grid(row=1, column=0, columnspan=5, sticky="nsew")
-        self.window.grid_rowconfigure(1, weight=1)
+        buttons_frame.grid(row=2, column=0, columnspan=5, sticky="nsew")
+        self.window.grid_rowconfigure(2, weight=1)
         for i in range(4):
             self.window.grid_columnconfigure(i, weight=1)
 
@@ -95,26 +122,44 @@ class CalculatorApp:
         # Bind keyboard events
         for key, button_text in config.KEYBOARD_BINDINGS.items():
             self.window.bind(key, lambda event, text=button_text: self.on_button_click(text))
+        # Ctrl+V, Shift+Insert or the platform's paste keys
+        self.window.bind('<<Paste>>', self.paste)
+
+    def paste(self, event=None):
+        """ Appends the expression in the clipboard as one piece, so DEL removes it at once. """
+        if self.worker.busy:
+            return 'break'
+        try:
+            text = sanitize_pasted(self.window.clipboard_get())
+        except tk.TclError:
+            # The clipboard is empty or does not hold text
+            return 'break'
+        if text:
+            self.expression.append(text)
+            self.update_display()
+        return 'break'
 
     @property
     def operation_acceptable(self):
         """ Checks if the last character of the current expression allows an operation. """
-        if not self.current_expression.strip():
+        last_char = self.expression.last_character()
+        if not last_char:
             return True
-        last_char = self.current_expression.strip()[-1]
         return last_char.isdigit() or last_char == ')'
 
     def on_button_click(self, button_text):
         """ Handles the logic for when a button is clicked. """
+        if self.worker.busy:
+            # Only cancelling is possible while a result is being computed
+            if button_text == 'AC':
+                self.cancel_evaluation()
+            return
         if button_text in {'AC', 'DEL', '='}:
             if button_text == 'AC':
-                self.current_expression = ""
+                self.expression.clear()
             elif button_text == 'DEL':
-                trimmed = self.current_expression.rstrip()
-                if trimmed and (trimmed[-1].isdigit() or trimmed[-1] in '.()'):
-                    self.current_expression = trimmed[:-1]
-                elif len(trimmed) > 1:
-                    self.current_expression = trimmed[:-3]
+                # Deletes the last key, e.g. a digit or a whole ' + '
+                self.expression.pop()
             elif button_text == '=':
                 self.evaluate_expression_ui()
         else:
@@ -124,36 +169,87 @@ class CalculatorApp:
             if button_text in {'+', '-', '×', '÷'}:
                 button_text = ' ' + (button_text.replace('×', '*').replace('÷', '/')) + ' '
             elif button_text == '√':
-                if not self.current_expression.strip() or not self.current_expression.strip()[-1].isdigit():
+                if not self.expression.last_character().isdigit():
                     button_text = '2'+button_text
             elif button_text == '?':
                 self.show_help()
                 return
             elif button_text == '!':
                 button_text = '! '
-            self.current_expression += button_text
+            self.expression.append(button_text)
 
         self.update_display()
 
     def evaluate_expression_ui(self):
-        """ Evaluates the mathematical expression entered by the user. """
-        expression = self.current_expression.replace('×', '*').replace('÷', '/')
-        try:
-            result = str(evaluate_expression(expression))
-            self.current_expression = result
-        except ZeroDivisionError:
-            self.current_expression = "Error: Division by zero"
-        except Exception as e:
-            print(e)
-            self.current_expression = "Error"
-        finally:
-            self.update_display()
+        """ Starts evaluating the mathematical expression entered by the user in the background. """
+        expression = self.expression.text.replace('×', '*').replace('÷', '/')
+        self.worker.submit(expression)
+        self.preview.config(text="Computing... (AC to cancel)")
+        self.window.after(config.EVALUATION_POLL_INTERVAL, self.check_evaluation)
+
+    def check_evaluation(self):
+        """ Shows the result of the background evaluation once it is available. """
+        if not self.worker.busy:
+            return
+        outcome = self.worker.poll()
+        if outcome is None:
+            if self.worker.elapsed() > config.EVALUATION_TIMEOUT:
+                self.worker.cancel()
+                # The replacement process starts while the error is shown, not on the next '='
+                self.worker.start()
+                self.expression.replace(ERROR_TIMEOUT)
+                self.update_display()
+            else:
+                self.window.after(config.EVALUATION_POLL_INTERVAL, self.check_evaluation)
+            return
+        succeeded, result = outcome
+        if succeeded:
+            self.expression.replace(str(result))
+        elif isinstance(result, ZeroDivisionError):
+            self.expression.replace("Error: Division by zero")
+        else:
+            print(result)
+            self.expression.replace("Error")
+        self.update_display()
+
+    def cancel_evaluation(self):
+        """ Stops the background evaluation and clears the display. """
+        self.worker.cancel()
+        self.worker.start()
+        self.expression.clear()
+        self.update_display()
 
     def update_display(self):
-        """ Updates the calculator's display with the current expression. """
+        """ Schedules updating the calculator's display with the current expression.
+
+        The display is redrawn once the pending events are handled, so a burst of key
+        presses (e.g. key repeat) is drawn only once.
+        """
+        if not self._render_pending:
+            self._render_pending = True
+            self.window.after_idle(self.render_display)
 
-        self.display.delete(0, tk.END)
-        self.display.insert(0, self.current_expression)
+    def render_display(self):
+        """ Replaces the changed end of the displayed expression and updates the preview. """
+        self._render_pending = False
+        start = self.expression.dirty
+        if start is None:
+            return
+        self.display.config(state=tk.NORMAL)
+        self.display.delete(start, tk.END)
+        self.display.insert(tk.END, self.expression.tail(start))
+        self.display.config(state='readonly')
+        self.display.xview(tk.END)
+        self.expression.mark_rendered()
+        self.update_preview()
+
+    def update_preview(self):
+        """ Shows the result of the expression typed so far under the display. """
+        result = self.evaluator.update(self.expression.text)
+        if result is None or str(result).startswith("Error"):
+            self.preview.config(text="")
+        else:
+            self.preview.config(text=f"= {result}")
 
     def run(self):
         """ Starts the calculator application. """
@@ -0,0 +1,355 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: This module provides performance benchmarks for the math_logic module
+
+@file benchmark.py
+@date 2026-10-18
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import math_logic as ml
+
+_NAME_RE = re.compile(r'[A-Za-z]\w*')
+
+DEFAULT_SIZES = (10, 1000, 10 ** 6, 10 ** 7)
+# Relative slowdown against the baseline that fails the suite
+DEFAULT_THRESHOLD = 0.25
+# Slowdowns smaller than this many seconds are timer noise, not regressions. Stages of
+# small expressions take microseconds, so they never fail the suite on their own.
+MIN_REGRESSION = 1e-3
+# Timed runs of every stage, the median of which is reported
+DEFAULT_REPEATS = 5
+STAGES = ('tokenize', 'postfix', 'evaluate')
+
+# Import time budgets in seconds of the headless modules, with cached bytecode
+IMPORT_BUDGETS = {'math_logic': 0.05, 'main': 0.01, 'cli': 0.08}
+# Modules the headless modules must not import
+GUI_MODULES = ('tkinter', 'config', 'app')
+_IMPORT_TIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+# Building blocks repeated up to the requested expression length
+_MIX_PARTS = {
+    'sum': ("1 + 2 - 3 + 4.5", " + "),
+    'nested': ("((((((1 + 2) * 3 - 4) / 5 + 6) * 7 - 8) / 9 + 1) * 2)", " + "),
+    'factorial_root': ("3! + 2√16 * 4! / 2√9", " + "),
+}
+MIXES = tuple(_MIX_PARTS)
+
+
+def substitute_variables(expression, values):
+    """Replace variable names in an expression with literal numbers.
+
+    Args:
+        expression (str): The infix expression.
+        values (dict): Mapping of variable names to numbers.
+
+    Returns:
+        str: The expression accepted by evaluate_expression.
+    """
+    def literal(match):
+        value = values[match.group()]
+        return f"({value!r})" if value < 0 else repr(value)
+
+    return _NAME_RE.sub(literal, expression)
+
+
+def benchmark_compiled(expression, variables, inputs, invocations=10 ** 6):
+    """Compare evaluate_expression with a compiled expression on changing inputs.
+
+    The current path has to format the inputs into the expression and parse it on
+    every call, the compiled path only calls the compiled function.
+
+    Args:
+        expression (str): The infix expression using the variables.
+        variables (tuple): The variable names.
+        inputs (list): Tuples of variable values, cycled through.
+        invocations (int): Number of evaluations per path.
+
+    Returns:
+        dict: Seconds taken by each path and the resulting speedup.
+    """
+    compiled = ml.compile_expression(expression, variables)
+    function = compiled.function
+    count = len(inputs)
+
+    start = time.perf_counter()
+    for i in range(invocations):
+        values = inputs[i % count]
+        ml.evaluate_expression(substitute_variables(expression, dict(zip(variables, values))))
+    interpreted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(invocations):
+        function(*inputs[i % count])
+    compiled_time = time.perf_counter() - start
+
+    return {
+        'invocations': invocations,
+        'evaluate_expression': interpreted,
+        'compile_expression': compiled_time,
+        'speedup': interpreted / compiled_time,
+    }
+
+
+def generate_expression(mix, size):
+    """Generate an expression of about size characters.
+
+    Args:
+        mix (str): The operator mix, one of the keys of _MIX_PARTS.
+        size (int): The desired length in characters.
+
+    Returns:
+        str: The expression, never shorter than one building block.
+    """
+    block, separator = _MIX_PARTS[mix]
+    count = max(1, (size + len(separator)) // (len(block) + len(separator)))
+    return separator.join([block] * count)
+
+
+def time_call(function, argument, min_time=0.2, min_repeats=DEFAULT_REPEATS, max_repeats=1000):
+    """Time a function call, repeating it for a stable measurement.
+
+    The median of the runs is reported: unlike the best time, one run that happened
+    to be lucky (or slowed down by the machine) does not move it.
+
+    Args:
+        function (function): The function to time.
+        argument: The single argument passed to it.
+        min_time (float): Keep repeating until this many seconds were spent.
+        min_repeats (int): Runs made however long they take.
+        max_repeats (int): Upper bound of repetitions.
+
+    Returns:
+        tuple: The median time of one call in seconds and the last return value.
+    """
+    times = []
+    spent = 0.0
+    repeats = 0
+    # Like timeit, keep the garbage collector from adding noise to the measurement
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while repeats < max_repeats and (repeats < min_repeats or spent < min_time):
+            start = time.perf_counter()
+            result = function(argument)
+            elapsed = time.perf_counter() - start
+            times.append(elapsed)
+            spent += elapsed
+            repeats += 1
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return statistics.median(times), result
+
+
+def _calibration_workload(count):
+    # Fixed pure-Python work measuring the current speed of the machine
+    total = 0.0
+    for i in range(count):
+        total += i * 0.5
+    return total
+
+
+def calibrate():
+    """Time a fixed reference workload.
+
+    Stage times are compared to the baseline relative to this time, which cancels out
+    differences in machine speed and load between the runs.
+
+    Returns:
+        float: The median time of the workload in seconds.
+    """
+    return time_call(_calibration_workload, 20000)[0]
+
+
+def run_suite(sizes=DEFAULT_SIZES, mixes=MIXES):
+    """Time every evaluation stage on generated expressions.
+
+    Args:
+        sizes (tuple): Expression lengths in characters.
+        mixes (tuple): Operator mixes, see generate_expression.
+
+    Returns:
+        dict: Environment information and a list of results, one per mix and size,
+        with the median time in seconds of each stage.
+    """
+    results = []
+    for mix in mixes:
+        for size in sizes:
+            expression = generate_expression(mix, size)
+            calibration = calibrate()
+            tokenize_time, tokens = time_call(ml.tokenize, expression)
+            postfix_time, postfix = time_call(ml.infix_to_postfix, tokens)
+            evaluate_time, value = time_call(ml.evaluate_postfix, postfix)
+            del tokens, postfix
+            results.append({
+                'mix': mix,
+                'size': size,
+                'chars': len(expression),
+                'calibration': calibration,
+                'tokenize': tokenize_time,
+                'postfix': postfix_time,
+                'evaluate': evaluate_time,
+                'result': str(value),
+            })
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def compare_to_baseline(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Find stages that got slower than the baseline by more than threshold.
+
+    Times are scaled by the calibration of their run before they are compared, and
+    slowdowns below MIN_REGRESSION seconds are ignored.
+
+    Args:
+        current (dict): Results of run_suite.
+        baseline (dict): Stored results of an earlier run_suite.
+        threshold (float): Allowed relative slowdown, 0.25 means 25 %.
+
+    Returns:
+        list: Descriptions of the regressions, empty if there are none.
+    """
+    stored = {(entry['mix'], entry['size']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in current['results']:
+        reference = stored.get((entry['mix'], entry['size']))
+        if reference is None:
+            continue
+        scale = reference['calibration'] / entry['calibration']
+        for stage in STAGES:
+            scaled = entry[stage] * scale
+            if scaled > reference[stage] * (1 + threshold) and scaled - reference[stage] > MIN_REGRESSION:
+                regressions.append(f"{entry['mix']}/{entry['size']}/{stage}: "
+                                   f"{reference[stage]:.6f} s -> {scaled:.6f} s (calibrated)")
+    return regressions
+
+
+def measure_import(module, repeats=5):
+    """Measure the import time of a module in fresh interpreters with -X importtime.
+
+    Bytecode caching is enabled for the measurement, as in a normal installation, and
+    the first run only warms the cache.
+
+    Args:
+        module (str): The module name, importable from this directory.
+        repeats (int): Number of measured runs.
+
+    Returns:
+        tuple: The best cumulative import time in seconds and the set of modules the
+        import loaded.
+    """
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    command = [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+    directory = os.path.dirname(os.path.abspath(__file__))
+    best = float('inf')
+    loaded = set()
+    for _ in range(repeats + 1):
+        stderr = subprocess.run(command, cwd=directory, env=env, capture_output=True, text=True,
+                                check=True).stderr
+        loaded = set()
+        for match in _IMPORT_TIME_RE.finditer(stderr):
+            loaded.add(match.group(4))
+            if match.group(4) == module and not match.group(3):
+                cumulative = int(match.group(2)) / 1e6
+        best = min(best, cumulative)
+    return best, loaded
+
+
+def check_startup(budgets=IMPORT_BUDGETS, repeats=5):
+    """Check the headless modules against their import time budgets.
+
+    Args:
+        budgets (dict): Budget in seconds per module name.
+        repeats (int): Number of measured runs per module.
+
+    Returns:
+        tuple: The best import time per module and a list of violations, empty if
+        every module is within budget and none imports a GUI module.
+    """
+    times = {}
+    violations = []
+    for module, budget in budgets.items():
+        times[module], loaded = measure_import(module, repeats)
+        if times[module] > budget:
+            violations.append(f"{module}: import takes {times[module] * 1000:.1f} ms, "
+                              f"budget {budget * 1000:.1f} ms")
+        for gui_module in GUI_MODULES:
+            if gui_module in loaded and gui_module != module:
+                violations.append(f"{module}: imports the GUI module {gui_module}")
+    return times, violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden Calculator benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    suite = commands.add_parser('suite', help="time tokenize/postfix/evaluate on generated expressions")
+    suite.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    suite.add_argument('--mixes', nargs='+', choices=MIXES, default=MIXES)
+    suite.add_argument('-o', '--output', help="write the JSON results to this file")
+    suite.add_argument('--baseline', help="JSON results to compare against")
+    suite.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    suite.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    compiled = commands.add_parser('compile', help="compare compile_expression with evaluate_expression")
+    compiled.add_argument('-n', '--invocations', type=int, default=10 ** 6)
+
+    startup = commands.add_parser('startup', help="check the import time budgets of the headless modules")
+    startup.add_argument('-r', '--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'startup':
+        times, violations = check_startup(repeats=args.repeats)
+        for module, seconds in times.items():
+            print(f"{module}: {seconds * 1000:.1f} ms (budget {IMPORT_BUDGETS[module] * 1000:.1f} ms)")
+        for violation in violations:
+            print(f"Over budget: {violation}", file=sys.stderr)
+        if violations:
+            sys.exit(1)
+        return
+
+    if args.command == 'compile':
+        inputs = [(x / 7, y + 1) for x in range(50) for y in range(20)]
+        results = benchmark_compiled("2 * x ^ 2 + y / 3 - 3√x + 5%", ('x', 'y'), inputs, args.invocations)
+        for key, value in results.items():
+            print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+        return
+
+    current = run_suite(args.sizes, args.mixes)
+    output = json.dumps(current, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            file.write(output + '\n')
+    elif args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare_to_baseline(current, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: This module provides a command line batch mode. Expressions are read line by
+line from a file or stdin and their results are written in the same order, one per line,
+as a stream, so memory use does not depend on the size of the input.
+
+@file cli.py
+@date 2026-10-18
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+import math_logic as ml
+
+# Lines evaluated as one task
+DEFAULT_CHUNK_SIZE = 10000
+# Chunks submitted per worker before waiting for the oldest one
+CHUNKS_PER_WORKER = 2
+
+
+def _evaluate_chunk(lines, budget=None):
+    # Evaluates a chunk of lines into the output text, runs in a worker process
+    results = ml.evaluate_many([line.rstrip('\r\n') for line in lines], workers=1, budget=budget)
+    return ''.join([f"{result}\n" for result in results])
+
+
+def _chunks(lines, size):
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def evaluate_stream(lines, output, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, budget=None):
+    """ Evaluates expressions from an iterable of lines and writes the results in order.
+
+    With several workers, chunks of lines are evaluated in a process pool; only a few
+    chunks per worker are in flight at once, so memory stays constant for any input.
+
+    Args:
+        lines (iterable): The expressions, one per line.
+        output (file): Text stream receiving one result or error message per line.
+        workers (int, optional): Number of worker processes, 1 evaluates in-process.
+        chunk_size (int, optional): Lines evaluated as one task.
+        budget (math_logic.EvaluationBudget, optional): Resource limits of every evaluation.
+
+    Returns:
+        tuple: Number of lines and characters read.
+    """
+    count = characters = 0
+    if workers <= 1:
+        for chunk in _chunks(iter(lines), chunk_size):
+            output.write(_evaluate_chunk(chunk, budget))
+            count += len(chunk)
+            characters += sum(map(len, chunk))
+        return count, characters
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in _chunks(iter(lines), chunk_size):
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                output.write(pending.popleft().result())
+            pending.append(pool.submit(_evaluate_chunk, chunk, budget))
+            count += len(chunk)
+            characters += sum(map(len, chunk))
+        while pending:
+            output.write(pending.popleft().result())
+    return count, characters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate expressions line by line")
+    parser.add_argument('input', nargs='?', default='-', help="file with one expression per line, - for stdin")
+    parser.add_argument('-o', '--output', help="write the results to this file instead of stdout")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="worker processes, 0 for the CPU count (default: 1, in-process)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--max-digits', type=int, help="reject results with more digits, see EvaluationBudget")
+    parser.add_argument('--max-seconds', type=float, help="reject evaluations estimated to take longer")
+    parser.add_argument('-q', '--quiet', action='store_true', help="do not report the throughput")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    budget = None
+    if args.max_digits is not None or args.max_seconds is not None:
+        budget = ml.EvaluationBudget(max_digits=args.max_digits, max_seconds=args.max_seconds)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output = sys.stdout if args.output is None else open(args.output, 'w', encoding='utf-8')
+    start = time.perf_counter()
+    try:
+        count, characters = evaluate_stream(source, output, workers, args.chunk_size, budget)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        print(f"{count} expressions in {elapsed:.3f} s: {count / max(elapsed, 1e-9):.0f} expressions/s, "
+              f"{characters / max(elapsed, 1e-9) / 1e6:.2f} M characters/s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,25 @@
 APP_TITLE = 'Calculator'
 APP_RESOLUTION = '400x600'
 DIGITS_FONT_STYLE = ("Arial", 24, "bold")
+PREVIEW_FONT_STYLE = ("Arial", 14)
+PREVIEW_TEXT_COLOR = "#6b6f60"
 BUTTONS_COLOR = "#f4f6eb"
 DISPLAY_COLOR = "#e2e5d8"
 
+# Seconds after which an evaluation is cancelled
+EVALUATION_TIMEOUT = 10
+# Milliseconds between checks whether a background evaluation has finished
+EVALUATION_POLL_INTERVAL = 20
+# Estimated seconds one operator of the live preview may take, larger results are
+# approximated or not shown so typing stays responsive
+PREVIEW_TIME_BUDGET = 0.05
+# Whether results of slow evaluations are kept on disk between runs, see result_cache.py
+RESULT_CACHE_ENABLED = True
+# Seconds an evaluation must take for its result to be kept
+RESULT_CACHE_MIN_SECONDS = 0.1
+# Bytes of kept results above which the least recently used are dropped
+RESULT_CACHE_MAX_BYTES = 64 << 20
+
 # Define keyboard bindings
 KEYBOARD_BINDINGS = {
     '1': '1', '2': '2', '3': '3', '4': '4', '5': '5', '6': '6', '7': '7', '8': '8', '9': '9', '0': '0',
@@ -0,0 +1,144 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: This module provides the editable buffer holding the expression shown on the
+calculator display.
+
+@file expression_buffer.py
+@date 2026-10-18
+"""
+
+import re
+from bisect import bisect_right
+
+# Characters that cannot be part of an expression, dropped from pasted text
+_REJECTED_RE = re.compile(r'[^0-9.e+\-*/×÷^√!%()\s]')
+
+
+def sanitize_pasted(text):
+    """ Turns pasted text into a piece of an expression.
+
+    Characters that cannot be part of an expression are dropped, '×' and '÷' become
+    '*' and '/' and runs of whitespace (e.g. line breaks) become a single space.
+
+    Args:
+        text (str): The text from the clipboard.
+
+    Returns:
+        str: The piece to append, empty if nothing is left.
+    """
+    text = _REJECTED_RE.sub('', text).replace('×', '*').replace('÷', '/')
+    return ' '.join(text.split())
+
+
+class ExpressionBuffer:
+    """ An expression stored as a list of pieces, one per entered key.
+
+    Appending a piece and deleting the last one take constant time regardless of the
+    length of the expression. The buffer remembers the first offset changed since the
+    last render, so a display only has to replace the changed tail.
+
+    Attributes:
+        dirty (int or None): Offset of the first character changed since mark_rendered,
+            None if nothing changed.
+    """
+
+    def __init__(self, text=''):
+        """ Initialize the buffer.
+
+        Args:
+            text (str, optional): The initial expression, see replace.
+        """
+        self._pieces = []
+        # Offset of every piece in the text
+        self._starts = []
+        self._length = 0
+        self._text = None
+        self.dirty = None
+        self.replace(text)
+
+    def __len__(self):
+        return self._length
+
+    def __str__(self):
+        return self.text
+
+    @property
+    def text(self):
+        """ str: The whole expression, joined only when it changed. """
+        if self._text is None:
+            self._text = ''.join(self._pieces)
+        return self._text
+
+    def _changed(self, offset):
+        self._text = None
+        if self.dirty is None or offset < self.dirty:
+            self.dirty = offset
+
+    def append(self, piece):
+        """ Appends a piece to the end of the expression.
+
+        Args:
+            piece (str): The text of one key, e.g. '7' or ' + '.
+        """
+        if not piece:
+            return
+        self._changed(self._length)
+        self._starts.append(self._length)
+        self._pieces.append(piece)
+        self._length += len(piece)
+
+    def pop(self):
+        """ Deletes the last piece of the expression.
+
+        Returns:
+            str: The deleted piece, empty if the buffer was empty.
+        """
+        if not self._pieces:
+            return ''
+        self._length = self._starts.pop()
+        self._changed(self._length)
+        return self._pieces.pop()
+
+    def replace(self, text):
+        """ Replaces the whole expression, e.g. with a result.
+
+        Every character becomes a piece of its own, so it can be deleted separately.
+
+        Args:
+            text (str): The new expression.
+        """
+        self._pieces = list(text)
+        self._starts = list(range(len(text)))
+        self._length = len(text)
+        self._changed(0)
+
+    def clear(self):
+        """ Deletes the whole expression. """
+        self.replace('')
+
+    def last_character(self):
+        """ Returns the last character that is not whitespace, empty if there is none. """
+        for piece in reversed(self._pieces):
+            piece = piece.rstrip()
+            if piece:
+                return piece[-1]
+        return ''
+
+    def tail(self, offset):
+        """ Returns the expression from an offset to its end.
+
+        Args:
+            offset (int): The first character, e.g. dirty.
+
+        Returns:
+            str: The text, built from the pieces after offset only.
+        """
+        if offset >= self._length:
+            return ''
+        index = bisect_right(self._starts, offset) - 1
+        return ''.join(self._pieces[index:])[offset - self._starts[index]:]
+
+    def mark_rendered(self):
+        """ Records that a display shows the current expression. """
+        self.dirty = None
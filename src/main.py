@@ -0,0 +1,136 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: The entry point of the calculator. Without arguments it launches the GUI, the
+headless commands evaluate expressions without ever importing tkinter or the GUI config:
+
+    python main.py                       the GUI
+    python main.py gui --no-cache        the GUI without the persistent result cache
+    python main.py eval EXPRESSION...    print the result of each expression
+    python main.py eval --no-cache ...   the same without the persistent result cache
+    python main.py eval --file FILE      evaluate one (huge) expression streamed from a file
+    python main.py eval --file FILE -j N the same split over N worker processes
+    python main.py eval -- -1 + 2        an expression starting with '-'
+    python main.py batch [FILE] ...      evaluate a file line by line, see cli.py
+    python main.py serve ...             run the evaluation server, see server.py
+
+Modules are imported only for the chosen command, so headless start-up stays fast.
+
+@file main.py
+@date 2026-10-18
+"""
+
+import sys
+
+
+def evaluate(expressions, use_cache=True):
+    """ Prints the result or error message of each expression on its own line.
+
+    Results of slow evaluations are kept in the persistent result cache, see
+    result_cache.py.
+
+    Args:
+        expressions (list): The infix expressions.
+        use_cache (bool, optional): False bypasses the result cache.
+
+    Returns:
+        int: The exit status, 1 if any expression failed.
+    """
+    from math_logic import evaluate_expression_safe, normalize_expression
+    from result_cache import ResultCache
+
+    cache = ResultCache(enabled=use_cache)
+    status = 0
+    for expression in expressions:
+        result = cache.evaluate(normalize_expression(expression), evaluate_expression_safe, expression)
+        if str(result).startswith("Error"):
+            status = 1
+        print(result)
+    return status
+
+
+def evaluate_file(path, workers=1):
+    """ Prints the result of the single expression in a file, read as a stream.
+
+    With several workers the file is read at once and the expression is split into
+    its top-level terms, see math_logic.evaluate_parallel.
+
+    Args:
+        path (str): The file, - for stdin.
+        workers (int, optional): Number of worker processes, 1 streams in-process.
+
+    Returns:
+        int: The exit status, 1 if the expression failed.
+    """
+    import math_logic as ml
+
+    source = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        if workers > 1:
+            result = ml.evaluate_parallel(source.read(), workers=workers)
+        else:
+            result = ml.evaluate_streaming(source)
+    except ZeroDivisionError:
+        result = ml.ERROR_DIVISION_BY_ZERO
+    except OverflowError:
+        result = ml.ERROR_OVERFLOW
+    except Exception:
+        result = ml.ERROR_INVALID_EXPRESSION
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print(result)
+    return 1 if str(result).startswith("Error") else 0
+
+
+def _parser():
+    # Imported here, only the commands parsed by this module need it
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='main.py', description="Golden Calculator, the GUI by default")
+    commands = parser.add_subparsers(dest='command')
+    gui = commands.add_parser('gui', help="launch the calculator")
+    gui.add_argument('--no-cache', action='store_true', help="bypass the persistent result cache")
+    evaluation = commands.add_parser('eval', help="print the result of each expression",
+                                     epilog="Put -- before expressions starting with '-'.")
+    evaluation.add_argument('expressions', nargs='*', metavar='EXPRESSION')
+    evaluation.add_argument('--file', nargs='?', const='-',
+                            help="evaluate one (huge) expression streamed from a file, - for stdin")
+    evaluation.add_argument('-j', '--jobs', type=int, default=1,
+                            help="worker processes the expression of --file is split over")
+    evaluation.add_argument('--no-cache', action='store_true', help="bypass the persistent result cache")
+    # Listed for the help only, the commands parse their arguments themselves
+    commands.add_parser('batch', help="evaluate a file line by line, see 'batch -h'", add_help=False)
+    commands.add_parser('serve', help="run the evaluation server, see 'serve -h'", add_help=False)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] in (['batch'], ['serve']):
+        module = __import__('cli' if argv[0] == 'batch' else 'server')
+        # The command parses the remaining arguments itself
+        sys.argv = [f"main.py {argv[0]}"] + argv[1:]
+        module.main()
+        return 0
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command == 'eval':
+        if args.jobs < 1:
+            parser.error("-j/--jobs must be at least 1")
+        if args.file is not None:
+            if args.expressions:
+                parser.error("--file cannot be combined with expressions")
+            return evaluate_file(args.file, workers=args.jobs)
+        if args.jobs != 1:
+            parser.error("-j/--jobs requires --file")
+        return evaluate(args.expressions, use_cache=not args.no_cache)
+    from app import CalculatorApp
+
+    app = CalculatorApp(use_cache=False) if getattr(args, 'no_cache', False) else CalculatorApp()
+    app.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,71 +11,447 @@ in infix and postfix notation.
 @date 2024-24-04
 """
 
+import keyword
+import math
+import os
 import re
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict, namedtuple
+from functools import partial
+
+# Default number of parsed expressions kept by the postfix cache
+DEFAULT_CACHE_SIZE = 1024
+# Longest normalized expression kept by the postfix cache. The postfix of an expression
+# takes about 10 bytes per character, so the full cache stays around 10 MB.
+CACHE_MAX_LENGTH = 1024
+
+# Error messages returned instead of a result
+ERROR_DIVISION_BY_ZERO = "Error: Division by zero"
+ERROR_FACTORIAL = "Error: Factorial requires a non-negative integer"
+ERROR_NEGATIVE_ROOT = "Error: Cannot take square root of a negative number"
+ERROR_INVALID_EXPRESSION = "Error: Invalid expression"
+ERROR_OVERFLOW = "Error: Result is too large"
+ERROR_TIMEOUT = "Error: Evaluation timed out"
+ERROR_BUDGET = "Error: Evaluation exceeds the resource budget"
+
+# Bytes of factorials remembered by factorial, large results would otherwise stay in
+# long-lived worker processes forever
+FACTORIAL_MEMO_BYTES = 32 << 20
+
+# Batches smaller than this are evaluated in-process by evaluate_many
+MIN_PARALLEL_BATCH = 2000
+
+# Characters read at once by iter_tokens from a file
+STREAM_CHUNK_SIZE = 1 << 16
+
+# Expressions shorter than this are evaluated serially by evaluate_parallel
+PARALLEL_MIN_LENGTH = 1 << 20
+# Pieces per worker an expression is split into by evaluate_parallel
+PIECES_PER_WORKER = 4
+
+# Whitespace that does not separate two operands ("1 2" must not become "12"). A run
+# between two operands keeps its last character.
+_WHITESPACE_RE = re.compile(r'(?<![\w.])\s+|\s+(?![\w.\s])')
+_WHITESPACE_RUN_RE = re.compile(r'\s+')
+
+# Token kinds produced by tokenize
+NUMBER = 'number'
+OPERATOR = 'operator'
+LPAREN = 'lparen'
+RPAREN = 'rparen'
+VARIABLE = 'variable'
+
+_OPERAND_KINDS = {NUMBER, VARIABLE}
+
+_TOKEN_PATTERN = (
+    r'(?P<number>\d+\.?\d*(?:e[+\-]?\d+)?)'
+    r'|(?P<operator>[+\-*/^√!%])'
+    r'|(?P<lparen>\()'
+    r'|(?P<rparen>\))'
+)
+_TOKEN_RE = re.compile(_TOKEN_PATTERN)
+# Names are only recognized when the caller declares variables, so plain expressions
+# keep skipping letters character by character
+_TOKEN_WITH_VARIABLES_RE = re.compile(_TOKEN_PATTERN + r'|(?P<variable>[A-Za-z]\w*)')
+_VARIABLE_NAME_RE = re.compile(r'[A-Za-z]\w*')
+# Characters that never occur inside a number, a chunk of a stream can be tokenized up to
+# them. A '+' or '-' is one unless it may be the exponent sign of a number like 2e+3. The
+# pattern matches the reversed text, so the first match is the last boundary.
+_REVERSED_TOKEN_BOUNDARY_RE = re.compile(r'[*/^√!%()\s]|[+\-](?![eE][\d.])')
+_OPERATOR_SYMBOLS = str.maketrans({'×': '*', '÷': '/'})
+
+# A named operand in a postfix expression, see compile_expression
+Variable = namedtuple('Variable', ['name'])
+
+_PRECEDENCE = {
+    '(': 0, ')': 0,  # Parentheses have the lowest precedence for stack operations
+    '!': 4,  # Factorial has the highest precedence
+    '^': 3,  # Exponentiation comes next
+    '√': 3,  # Square root has the same precedence as exponentiation
+    '*': 2,  # Multiplication
+    '/': 2,  # Division
+    '+': 1,  # Addition
+    '-': 1,  # Subtraction
+    '%': 1   # Percent
+}
+_RIGHT_ASSOCIATIVE = {'^', '√', '!'}
+
+
+class ExpressionCache:
+    """ A bounded LRU cache of parsed (postfix) expressions.
+
+    Keys are normalized expression strings (see normalize_expression), values are
+    the postfix token sequences produced for them. With a weigh function the cache
+    limits the total weight of its values (e.g. their bytes) instead of their number.
+
+    Attributes:
+        maxsize (int): Maximum number (or total weight) of stored values, 0 disables caching.
+        hits (int): Number of successful lookups.
+        misses (int): Number of failed lookups.
+        evictions (int): Number of entries dropped because the cache was full.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, weigh=None):
+        """ Initialize an empty cache holding at most maxsize expressions.
+
+        Args:
+            maxsize (int, optional): The capacity.
+            weigh (callable, optional): Returns the weight of a value, 1 for every
+                value by default.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._weigh = weigh
+        self._weight = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """ Returns the cached value for key (marking it as recently used) or None. """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """ Stores value under key, evicting the least recently used entries if needed. """
+        weight = self._weigh(value) if self._weigh is not None else 1
+        with self._lock:
+            if weight > self.maxsize:
+                return
+            if key in self._entries:
+                self._weight -= self._weigh(self._entries[key]) if self._weigh is not None else 1
+            self._entries[key] = value
+            self._weight += weight
+            self._entries.move_to_end(key)
+            self._trim()
+
+    def resize(self, maxsize):
+        """ Changes the capacity of the cache, evicting entries that no longer fit. """
+        if maxsize < 0:
+            raise ValueError("Cache size must be a non-negative integer.")
+        with self._lock:
+            self.maxsize = maxsize
+            self._trim()
+
+    def clear(self):
+        """ Removes all entries and resets the statistics counters. """
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self):
+        """ Returns the cache statistics as a dictionary. """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+        }
+
+    def _trim(self):
+        while self._weight > self.maxsize:
+            _, value = self._entries.popitem(last=False)
+            self._weight -= self._weigh(value) if self._weigh is not None else 1
+            self.evictions += 1
+
+
+_postfix_cache = ExpressionCache()
+
+# Callback receiving the metrics of every evaluate_expression call, None when disabled
+_instrumentation_sink = None
+
+
+def set_cache_size(maxsize):
+    """ Sets the maximum number of parsed expressions kept by evaluate_expression.
+
+    Expressions longer than CACHE_MAX_LENGTH characters are never kept, so the memory
+    of the cache stays proportional to its size.
+
+    Args:
+        maxsize (int): The new capacity, 0 disables caching.
+    """
+    _postfix_cache.resize(maxsize)
+
+
+def clear_cache():
+    """ Empties the parsed expression cache and resets its counters. """
+    _postfix_cache.clear()
+
+
+def cache_info():
+    """ Returns hit/miss/eviction counters and the size of the parsed expression cache.
+
+    Returns:
+        dict: Keys 'hits', 'misses', 'evictions', 'size' and 'maxsize'.
+    """
+    return _postfix_cache.info()
+
+
+def normalize_expression(expression):
+    """ Normalizes an expression so equivalent spellings share one cache entry.
+
+    Display operators '×' and '÷' are folded to '*' and '/', and whitespace is removed
+    except for a single character between two operands. Expressions containing 'e',
+    which may be part of a number, only have whitespace runs folded to one space.
+
+    Args:
+        expression (str): The infix expression.
+
+    Returns:
+        str: The normalized expression.
+    """
+    expression = expression.replace('×', '*').replace('÷', '/').strip()
+    if 'e' in expression:
+        # Removing whitespace could join "2e + 5" into the number 2e+5
+        return _WHITESPACE_RUN_RE.sub(' ', expression)
+    return _WHITESPACE_RE.sub('', expression)
+
+
+def tokenize(expression, variables=()):
+    """ Splits an infix expression into typed tokens in a single scan.
+
+    Numbers are converted to float once here, so later stages never have to
+    re-recognize or re-parse them. Characters that are not part of any token are skipped.
+
+    Args:
+        expression (str): The infix mathematical expression.
+        variables (tuple, optional): Names recognized as VARIABLE tokens. Other names
+            are skipped.
+
+    Returns:
+        list: A list of (kind, value, pos) tuples, where kind is one of NUMBER,
+        OPERATOR, LPAREN, RPAREN or VARIABLE, value is a float for numbers and the
+        operator character or variable name otherwise, and pos is the offset of the
+        token in the expression.
+    """
+    tokens = []
+    append = tokens.append
+    if not variables:
+        for match in _TOKEN_RE.finditer(expression):
+            kind = match.lastgroup
+            text = match.group()
+            append((kind, float(text) if kind == NUMBER else text, match.start()))
+        return tokens
+    for match in _TOKEN_WITH_VARIABLES_RE.finditer(expression):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == VARIABLE and text not in variables:
+            continue
+        append((kind, float(text) if kind == NUMBER else text, match.start()))
+    return tokens
+
+
+def _legacy_token(token):
+    # Classifies a plain string token as produced by split_by_expression_parts
+    if re.match(r'^[\d\.]+(?:e[+\-]?\d+)?$', token):
+        return NUMBER, float(token), None
+    if token == '(':
+        return LPAREN, token, None
+    if token == ')':
+        return RPAREN, token, None
+    if token in _PRECEDENCE:
+        return OPERATOR, token, None
+    return None, token, None
 
 
 def infix_to_postfix(expression):
     """ Converts an infix expression (standard arithmetic form) to postfix (RPN).
 
     Args:
-        expression (str): The infix mathematical expression to convert.
+        expression (list): Tokens produced by tokenize. Plain string tokens as produced
+            by split_by_expression_parts are accepted as well.
 
     Returns:
-        list: A list of tokens representing the postfix expression.
+        list: A list of tokens representing the postfix expression, numbers are floats,
+        variables are Variable tuples and operators are strings.
     """
 
-    precedence = {
-        '(': 0, ')': 0,  # Parentheses have the lowest precedence for stack operations
-        '!': 4,  # Factorial has the highest precedence
-        '^': 3,  # Exponentiation comes next
-        '√': 3,  # Square root has the same precedence as exponentiation
-        '*': 2,  # Multiplication
-        '/': 2,  # Division
-        '+': 1,  # Addition
-        '-': 1,  # Subtraction
-        '%': 1   # Percent
-    }
-    right_associative = {'^', '√', '!'}
+    precedence = _PRECEDENCE
+    right_associative = _RIGHT_ASSOCIATIVE
     stack = []
     postfix = []
-    previous_token = None
+    previous_kind = None
     for token in expression:
-        if re.match(r'^[\d\.]+(?:e[+\-]?\d+)?$', token):
-            postfix.append(token)
-        elif token in precedence:
-            if token == '(':
-                stack.append(token)
-            elif token == ')':
-                while stack and stack[-1] != '(':
-                    postfix.append(stack.pop())
-                stack.pop()
-            else:
-                if token == '-' and (previous_token is None or previous_token in "+-*/!^√()%"):
-                    postfix.append('0')
-                while (stack and stack[-1] != '(' and
-                       (precedence[stack[-1]] > precedence[token] or
-                        (precedence[stack[-1]] == precedence[token] and token not in right_associative))):
-                    postfix.append(stack.pop())
-                stack.append(token)
-        previous_token = token
+        if token.__class__ is str:
+            token = _legacy_token(token)
+        kind, value = token[0], token[1]
+        if kind == NUMBER:
+            postfix.append(value)
+        elif kind == OPERATOR:
+            if value == '-' and previous_kind not in _OPERAND_KINDS:
+                postfix.append(0.0)
+            while (stack and stack[-1] != '(' and
+                   (precedence[stack[-1]] > precedence[value] or
+                    (precedence[stack[-1]] == precedence[value] and value not in right_associative))):
+                postfix.append(stack.pop())
+            stack.append(value)
+        elif kind == LPAREN:
+            stack.append(value)
+        elif kind == RPAREN:
+            while stack and stack[-1] != '(':
+                postfix.append(stack.pop())
+            stack.pop()
+        elif kind == VARIABLE:
+            postfix.append(Variable(value))
+        previous_kind = kind
     while stack:
         postfix.append(stack.pop())
     return postfix
 
 
-def evaluate_postfix(postfix):
+def iter_tokens(source, chunk_size=STREAM_CHUNK_SIZE):
+    """ Yields the typed tokens of an infix expression lazily, like tokenize.
+
+    Args:
+        source (str or file): The expression, or a text stream it is read from in chunks.
+            '×' and '÷' are accepted like in evaluate_expression.
+        chunk_size (int, optional): Characters read from the stream at once.
+
+    Yields:
+        tuple: (kind, value, pos) tokens, see tokenize.
+    """
+    if isinstance(source, str):
+        for match in _TOKEN_RE.finditer(source.translate(_OPERATOR_SYMBOLS)):
+            kind = match.lastgroup
+            text = match.group()
+            yield kind, float(text) if kind == NUMBER else text, match.start()
+        return
+    pending = ''
+    offset = 0
+    while True:
+        chunk = source.read(chunk_size)
+        text = pending + chunk.translate(_OPERATOR_SYMBOLS)
+        if chunk:
+            # A number at the end of the chunk might continue in the next one
+            boundary = _REVERSED_TOKEN_BOUNDARY_RE.search(text[::-1])
+            end = len(text) - boundary.start() if boundary else 0
+        else:
+            end = len(text)
+        for match in _TOKEN_RE.finditer(text, 0, end):
+            kind = match.lastgroup
+            value = match.group()
+            yield kind, float(value) if kind == NUMBER else value, offset + match.start()
+        if not chunk:
+            return
+        pending = text[end:]
+        offset += end
+
+
+def iter_postfix(tokens):
+    """ Converts infix tokens to postfix lazily, like infix_to_postfix.
+
+    Every postfix token is yielded as soon as it is determined, so only the operator
+    stack is kept, not the whole expression.
+
+    Args:
+        tokens (iterable): Tokens as produced by tokenize or iter_tokens.
+
+    Yields:
+        float or str: The postfix tokens.
+    """
+    precedence = _PRECEDENCE
+    right_associative = _RIGHT_ASSOCIATIVE
+    stack = []
+    previous_kind = None
+    for kind, value, _ in tokens:
+        if kind == NUMBER:
+            yield value
+        elif kind == OPERATOR:
+            if value == '-' and previous_kind not in _OPERAND_KINDS:
+                yield 0.0
+            while (stack and stack[-1] != '(' and
+                   (precedence[stack[-1]] > precedence[value] or
+                    (precedence[stack[-1]] == precedence[value] and value not in right_associative))):
+                yield stack.pop()
+            stack.append(value)
+        elif kind == LPAREN:
+            stack.append(value)
+        elif kind == RPAREN:
+            while stack and stack[-1] != '(':
+                yield stack.pop()
+            stack.pop()
+        elif kind == VARIABLE:
+            yield Variable(value)
+        previous_kind = kind
+    while stack:
+        yield stack.pop()
+
+
+def evaluate_streaming(source, budget=None, chunk_size=STREAM_CHUNK_SIZE):
+    """ Evaluates an expression through a pipeline of generators.
+
+    Tokens are produced, converted to postfix and evaluated one at a time, so memory
+    is proportional to the depth of the operator and operand stacks instead of the
+    length of the expression. Results and errors are those of evaluate_expression,
+    except that an unmatched ')' only raises IndexError once it is reached, so an
+    evaluation error before it is returned instead. The postfix cache is not used.
+
+    Args:
+        source (str or file): The expression, or a text stream it is read from.
+        budget (EvaluationBudget, optional): Resource limits of the evaluation.
+        chunk_size (int, optional): Characters read from the stream at once.
+
+    Returns:
+        float or str: The result of the expression or an error message.
+    """
+    return evaluate_postfix(iter_postfix(iter_tokens(source, chunk_size)), budget)
+
+
+def evaluate_postfix(postfix, budget=None):
     """ Evaluates a postfix expression.
 
     Args:
-        postfix (list): The postfix expression as a list of tokens.
+        postfix (list): The postfix expression as produced by infix_to_postfix. Numbers
+            may also be given as strings.
+        budget (EvaluationBudget, optional): Resource limits, checked before every operator.
 
     Returns:
         float or str: The result of the evaluation or an error message.
     """
 
+    if budget is not None:
+        return _evaluate_postfix_budgeted(postfix, budget)
     stack = []
     for char in postfix:
-        if re.match(r'^[\d\.]+(?:e[+\-]?\d+)?$', char):
+        if char.__class__ is not str:
+            stack.append(char)
+        elif char not in _PRECEDENCE:
             stack.append(float(char))
         else:
             b = stack.pop()
@@ -91,18 +467,18 @@ def evaluate_postfix(postfix):
             elif char == '/':
                 a = stack.pop()
                 if b == 0:
-                    return "Error: Division by zero"
+                    return ERROR_DIVISION_BY_ZERO
                 result = div(a, b)
             elif char == '^':
                 a = stack.pop()
                 result = power(a, b)
             elif char == '!':
-                if not b.is_integer() or b < 0:
-                    return "Error: Factorial requires a non-negative integer"
+                if b % 1 != 0 or b < 0:
+                    return ERROR_FACTORIAL
                 result = factorial(b)
             elif char == '√':
                 if b < 0:
-                    return "Error: Cannot take square root of a negative number"
+                    return ERROR_NEGATIVE_ROOT
                 try:
                     a = stack.pop()
                     result = root(b, a)
@@ -113,32 +489,1378 @@ def evaluate_postfix(postfix):
             stack.append(result)
     result = stack.pop()
     if len(stack) != 0:
-        return "Error: Invalid expression"
+        return ERROR_INVALID_EXPRESSION
+    return _format_result(result)
+
+
+def _format_result(result):
+    # Formats the final value of an evaluation for display
     if result > 1e10:
-        return format(result, '.2e')
+        return format_scientific(result)
     elif result % 1 == 0:
         return int(result)
     return round(result, 7)
 
 
+def format_scientific(value, digits=2):
+    """ Formats a number in scientific notation like format(value, '.2e').
+
+    Integers too large for a float (e.g. big factorials) are formatted from a logarithm
+    estimated via bit_length, so they are never converted to float or to a decimal string.
+
+    Args:
+        value (float or int): The number to format.
+        digits (int, optional): Number of digits after the decimal point.
+
+    Returns:
+        str: The formatted number, e.g. '7.89e+374'.
+    """
+    if value.__class__ is not int or value.bit_length() <= 1000:
+        return format(value, f'.{digits}e')
+    sign = '-' if value < 0 else ''
+    value = abs(value)
+    # The top 64 bits carry far more precision than the printed digits need
+    shift = value.bit_length() - 64
+    log10 = math.log10(value >> shift) + shift * math.log10(2)
+    exponent = math.floor(log10)
+    mantissa = round(10 ** (log10 - exponent), digits)
+    if mantissa >= 10:
+        mantissa /= 10
+        exponent += 1
+    return f"{sign}{mantissa:.{digits}f}e+{exponent:02d}"
+
+
 def split_by_expression_parts(expression):
     parts = re.findall(r'[+\-*/^√!%()]|\d+\.?\d*(?:e[+\-]?\d+)?', expression)
     return parts
 
 
-def evaluate_expression(expression):
+def evaluate_expression(expression, optimize=False, budget=None):
     """ Evaluates a mathematical expression in infix format.
 
+    The postfix form of every expression is kept in a bounded LRU cache, so evaluating
+    the same expression again skips parsing entirely.
+
+    Args:
+        expression (str): The infix expression to evaluate.
+        optimize (bool, optional): Evaluate through an ExpressionDAG, so repeated
+            subexpressions are computed only once. Ignored when a budget is given, as
+            the DAG computes constant subexpressions while it is built.
+        budget (EvaluationBudget, optional): Resource limits of the evaluation.
+
+    Returns:
+        float or str: The result of the expression or an error message.
+    """
+
+    if _instrumentation_sink is not None:
+        return _evaluate_instrumented(expression, _instrumentation_sink, optimize, budget)
+    key = normalize_expression(expression)
+    cached = len(key) <= CACHE_MAX_LENGTH
+    postfix = _postfix_cache.get(key) if cached else None
+    if postfix is None:
+        postfix = tuple(infix_to_postfix(tokenize(key)))
+        if cached:
+            _postfix_cache.put(key, postfix)
+    if optimize and budget is None:
+        return _evaluate_optimized(postfix)
+    return evaluate_postfix(postfix, budget)
+
+
+def _evaluate_optimized(postfix):
+    try:
+        dag = ExpressionDAG(postfix)
+    except ValueError:
+        return evaluate_postfix(postfix)
+    return dag.evaluate()
+
+
+def set_instrumentation(sink):
+    """ Installs a metrics sink called after every evaluate_expression call.
+
+    The sink receives a dictionary with the per-stage times in seconds ('normalize_time',
+    'tokenize_time', 'postfix_time', 'evaluate_time', 'total_time'), 'cache_hit',
+    'expression_length', 'tokens' (None on a cache hit), 'postfix_tokens', 'operators'
+    (a Counter of operator occurrences), 'peak_stack_depth' of the evaluation stack and
+    either 'result' or 'error' (the exception raised). Instrumentation is disabled by
+    default and costs nothing then.
+
+    Args:
+        sink (callable): The callback, or None to disable instrumentation.
+
+    Returns:
+        callable: The previously installed sink or None.
+    """
+    global _instrumentation_sink
+    previous = _instrumentation_sink
+    _instrumentation_sink = sink
+    return previous
+
+
+def postfix_stack_depth(postfix):
+    """ Computes the largest number of operands on the stack while evaluating postfix.
+
+    Args:
+        postfix (list): The postfix expression as produced by infix_to_postfix.
+
+    Returns:
+        int: The peak depth of the evaluation stack.
+    """
+    depth = peak = 0
+    for token in postfix:
+        if token.__class__ is not str or token not in _PRECEDENCE:
+            depth += 1
+            if depth > peak:
+                peak = depth
+        elif token in _BINARY_TEMPLATES or (token == '√' and depth > 1):
+            depth -= 1
+    return peak
+
+
+def _evaluate_instrumented(expression, sink, optimize=False, budget=None):
+    # evaluate_expression with every stage timed, the metrics are passed to sink
+    clock = time.perf_counter
+    metrics = {
+        'expression_length': len(expression),
+        'cache_hit': False,
+        'tokens': None,
+        'normalize_time': 0.0,
+        'tokenize_time': 0.0,
+        'postfix_time': 0.0,
+        'evaluate_time': 0.0,
+    }
+    start = clock()
+    try:
+        key = normalize_expression(expression)
+        stage = clock()
+        metrics['normalize_time'] = stage - start
+        cached = len(key) <= CACHE_MAX_LENGTH
+        postfix = _postfix_cache.get(key) if cached else None
+        if postfix is None:
+            tokens = tokenize(key)
+            metrics['tokens'] = len(tokens)
+            metrics['tokenize_time'] = clock() - stage
+            stage = clock()
+            postfix = tuple(infix_to_postfix(tokens))
+            metrics['postfix_time'] = clock() - stage
+            if cached:
+                _postfix_cache.put(key, postfix)
+        else:
+            metrics['cache_hit'] = True
+        metrics['postfix_tokens'] = len(postfix)
+        metrics['operators'] = Counter(token for token in postfix if token.__class__ is str)
+        metrics['peak_stack_depth'] = postfix_stack_depth(postfix)
+        stage = clock()
+        if optimize and budget is None:
+            result = _evaluate_optimized(postfix)
+        else:
+            result = evaluate_postfix(postfix, budget)
+        metrics['evaluate_time'] = clock() - stage
+        metrics['result'] = result
+        return result
+    except Exception as error:
+        metrics['error'] = error
+        raise
+    finally:
+        metrics['total_time'] = clock() - start
+        sink(metrics)
+
+
+def evaluate_expression_safe(expression, budget=None):
+    """ Evaluates an infix expression, reporting failures as error messages.
+
+    Unlike evaluate_expression, malformed expressions and arithmetic exceptions do not
+    raise but are returned as one of the ERROR_* messages.
+
     Args:
         expression (str): The infix expression to evaluate.
+        budget (EvaluationBudget, optional): Resource limits of the evaluation.
 
     Returns:
         float or str: The result of the expression or an error message.
     """
+    try:
+        return evaluate_expression(expression, budget=budget)
+    except ZeroDivisionError:
+        return ERROR_DIVISION_BY_ZERO
+    except OverflowError:
+        return ERROR_OVERFLOW
+    except Exception:
+        return ERROR_INVALID_EXPRESSION
+
+
+def evaluate_many(expressions, workers=None, chunksize=None, executor=None,
+                  min_parallel=MIN_PARALLEL_BATCH, budget=None):
+    """ Evaluates many independent expressions, in parallel over a process pool.
+
+    Results are returned in input order. Batches smaller than min_parallel (or with a
+    single worker) are evaluated in-process, where pool start-up would dominate.
+
+    Args:
+        expressions (iterable): The infix expressions.
+        workers (int, optional): Number of worker processes, defaults to the CPU count.
+        chunksize (int, optional): Expressions sent to a worker at once, by default the
+            batch is split into about four chunks per worker.
+        executor (concurrent.futures.Executor, optional): A pool to reuse instead of
+            starting a new one.
+        min_parallel (int, optional): Smallest batch evaluated in parallel.
+        budget (EvaluationBudget, optional): Resource limits of every evaluation.
+
+    Returns:
+        list: The result or error message of each expression, see evaluate_expression_safe.
+    """
+    expressions = list(expressions)
+    if workers is None:
+        workers = getattr(executor, '_max_workers', None) or os.cpu_count() or 1
+    evaluate = evaluate_expression_safe if budget is None else partial(evaluate_expression_safe, budget=budget)
+    if len(expressions) < min_parallel or workers <= 1:
+        return [evaluate(expression) for expression in expressions]
+
+    if chunksize is None:
+        chunksize = max(1, -(-len(expressions) // (workers * 4)))
+    if executor is not None:
+        return list(executor.map(evaluate, expressions, chunksize=chunksize))
+    # Imported here, multiprocessing would double the import time of the module
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(evaluate, expressions, chunksize=chunksize))
+
+
+# Operators joining the top-level terms evaluate_parallel splits an expression into
+_CHAIN_OPERATORS = {'+': ('+', '-'), '*': ('*',)}
+# Top-level operators that make splitting at the chain operators change the parse
+_CHAIN_BREAKERS = {'+': ('%',), '*': ('+', '-', '/', '%')}
+# The signs of an exponent like 1e+5 are part of the number, not operators
+_NOT_EXPONENT = r'(?:(?<!\de)(?<!\d\.e)[+\-]|[+\-](?!\d))'
+# A top-level chain operator, in the expression with the parenthesized groups masked
+_CHAIN_RE = {'+': re.compile(_NOT_EXPONENT), '*': re.compile(r'\*')}
+# A top-level chain operator that is unary or not followed by a complete term. Only a
+# number may precede a '-', a number, ')' or '!' may precede a '+' or '*'. The
+# lookbehinds follow the operator, so the search only stops at operators.
+_BAD_CHAIN_RE = {
+    '+': re.compile(r'[+\-](?:(?!\s?[\d(])'
+                    r'|(?<=-)(?<!\d-)(?<!\d\.-)(?<!\d\s-)(?<!\d\.\s-)(?<!\de-)(?<!\d\.e-)'
+                    r'|(?<=\+)(?<![\d)!]\+)(?<!\d\.\+)(?<![\d)!]\s\+)(?<!\d\.\s\+)(?<!\de\+)(?<!\d\.e\+))'),
+    '*': re.compile(r'\*(?:(?!\s?[\d(])|(?<![\d)!]\*)(?<!\d\.\*)(?<![\d)!]\s\*)(?<!\d\.\s\*))'),
+}
+# Bottom of the stack of a term evaluated on its own. In the whole expression an operator
+# using it would take a value of the preceding terms instead, so such a term is not
+# evaluated on its own.
+_TERM_BASE = object()
+
+
+def evaluate_parallel(expression, workers=None, executor=None, min_length=PARALLEL_MIN_LENGTH):
+    """ Evaluates one long expression on several cores.
+
+    The expression is split into pieces at the operators joining its top-level terms:
+    '+' and '-', or '*' if there are none. Parenthesized groups are never split, so they
+    are evaluated by the worker of their piece. The workers evaluate every term on its
+    own and the term values are combined left to right, exactly as evaluate_postfix
+    would, so results and error messages are identical to evaluate_expression.
+    Expressions whose terms depend on each other (e.g. a top-level '%' or unary minus)
+    are recognized before any work is dispatched and evaluated serially, as are the
+    malformed ones whose terms raise an exception.
+
+    Args:
+        expression (str): The infix expression to evaluate.
+        workers (int, optional): Number of worker processes, defaults to the CPU count.
+        executor (concurrent.futures.Executor, optional): A pool to reuse instead of
+            starting a new one.
+        min_length (int, optional): Shortest expression evaluated in parallel.
+
+    Returns:
+        float or str: The result of the expression or an error message.
+    """
+    if workers is None:
+        workers = getattr(executor, '_max_workers', None) or os.cpu_count() or 1
+    if len(expression) < min_length or workers <= 1:
+        return evaluate_expression(expression)
+    pieces, chain = _split_pieces(normalize_expression(expression), workers * PIECES_PER_WORKER)
+    if len(pieces) < 2:
+        return evaluate_expression(expression)
+    chains = [chain] * len(pieces)
+    if executor is not None:
+        results = list(executor.map(_evaluate_piece, pieces, chains))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_evaluate_piece, pieces, chains))
+    if any(result is None for result in results):
+        return evaluate_expression(expression)
+    return _combine_terms(results)
+
+
+def _split_pieces(text, count):
+    # Splits text into about count pieces at top-level chain operators, every piece but
+    # the first starts with the operator joining it to the previous one. Returns the
+    # whole text and None if its terms cannot be evaluated independently.
+    while text.startswith('(') and text.endswith(')') and _closing_parenthesis(text) == len(text) - 1:
+        text = text[1:-1]
+    masked = _mask_groups(text)
+    if masked is None or not (masked[:1].isdigit() or masked[:1] == '('):
+        return [text], None
+    # '*' only joins the terms if there is no top-level '+' or '-'
+    chain = '+' if _CHAIN_RE['+'].search(masked) else '*'
+    if not _CHAIN_RE[chain].search(masked) or _BAD_CHAIN_RE[chain].search(masked) or \
+            any(breaker in masked for breaker in _CHAIN_BREAKERS[chain] if breaker not in '+-'):
+        return [text], None
+    cuts = []
+    start = 0
+    for piece in range(1, count):
+        target = max(start + 1, len(text) * piece // count)
+        match = _CHAIN_RE[chain].search(masked, target)
+        if match is None:
+            break
+        start = match.start()
+        cuts.append(start)
+    bounds = [0] + cuts + [len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])], chain
+
+
+def _closing_parenthesis(text):
+    # Index of the parenthesis closing the one text starts with, -1 if there is none
+    depth = 0
+    for match in re.finditer(r'[()]', text):
+        depth += 1 if match.group() == '(' else -1
+        if depth == 0:
+            return match.start()
+    return -1
+
+
+def _mask_groups(text):
+    # Text with the inside of every top-level parenthesized group replaced by zeros, so
+    # only top-level operators are left at their positions. None if the parentheses
+    # are not balanced.
+    parts = []
+    depth = start = 0
+    for match in re.finditer(r'[()]', text):
+        if match.group() == '(':
+            if depth == 0:
+                parts.append(text[start:match.start() + 1])
+                start = match.start() + 1
+            depth += 1
+        else:
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0:
+                parts.append('0' * (match.start() - start))
+                start = match.start()
+    if depth != 0:
+        return None
+    parts.append(text[start:])
+    return ''.join(parts)
+
+
+def _evaluate_piece(piece, chain):
+    # Evaluates the terms of a piece of an expression on their own. Returns the chain
+    # operator before every term (None for the first term of the expression) and the
+    # term outcomes, or None if the terms cannot be evaluated independently, which
+    # _split_pieces already ruled out unless a term is malformed.
+    operators = _CHAIN_OPERATORS[chain]
+    breakers = _CHAIN_BREAKERS[chain]
+    chain_operators = []
+    outcomes = []
+    term = []
+    operator = None
+    depth = 0
+    previous = None
+    for token in tokenize(piece):
+        kind, value = token[0], token[1]
+        if depth == 0 and kind == OPERATOR and value in operators:
+            # Binary operators only, unary minus would join the terms differently
+            if previous is not None and previous[0] != NUMBER and \
+                    (value == '-' or not (previous[0] == RPAREN or previous[1] == '!')):
+                return None
+            if term:
+                outcomes.append(_evaluate_term(term))
+                chain_operators.append(operator)
+                term = []
+            operator = value
+        elif depth == 0 and kind == OPERATOR and value in breakers:
+            return None
+        else:
+            if not term and kind not in (NUMBER, LPAREN):
+                return None
+            if kind == LPAREN:
+                depth += 1
+            elif kind == RPAREN:
+                depth -= 1
+                if depth < 0:
+                    return None
+            term.append(token)
+        previous = token
+    if depth != 0 or not term:
+        return None
+    outcomes.append(_evaluate_term(term))
+    chain_operators.append(operator)
+    if any(outcome is None for outcome in outcomes):
+        return None
+    return chain_operators, outcomes
+
+
+def _evaluate_term(tokens):
+    # Evaluates one term like evaluate_postfix without formatting. Returns its value, a
+    # list of values if several are left on the stack, an error message, or None if the
+    # term raises or would use values of the preceding terms.
+    if len(tokens) == 1:
+        return tokens[0][1]
+    try:
+        postfix = infix_to_postfix(tokens)
+    except IndexError:
+        return None
+    stack = [_TERM_BASE]
+    try:
+        for token in postfix:
+            if token.__class__ is not str:
+                stack.append(token)
+                continue
+            b = stack.pop()
+            if token in _BINARY_TEMPLATES:
+                operands = (stack.pop(), b)
+            elif token == '√':
+                operands = (b, stack.pop())
+            elif token in _UNARY_TEMPLATES:
+                operands = (b,)
+            else:
+                return None
+            if _TERM_BASE in operands:
+                # The whole expression would apply the operator to a preceding term
+                return None
+            stack.append(_apply_operator(token, operands))
+    except _EvaluationError as error:
+        return str(error)
+    except Exception:
+        return None
+    if len(stack) == 1:
+        return None
+    return stack[1] if len(stack) == 2 else stack[1:]
+
+
+def _combine_terms(results):
+    # Combines the term outcomes of all pieces left to right like evaluate_postfix
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    for chain_operators, outcomes in results:
+        for operator, outcome in zip(chain_operators, outcomes):
+            if outcome.__class__ is str:
+                return outcome
+            if outcome.__class__ is list:
+                stack.extend(outcome)
+            else:
+                push(outcome)
+            if operator is not None:
+                b = pop()
+                a = pop()
+                if operator == '+':
+                    # Like sum, which plus uses, 0.0 + -0.0 is 0.0
+                    push(0 + a + b)
+                elif operator == '-':
+                    push(a - b)
+                else:
+                    push(a * b)
+    result = pop()
+    if stack:
+        return ERROR_INVALID_EXPRESSION
+    return _format_result(result)
+
+
+class _EvaluationError(Exception):
+    """ Raised inside compiled expressions to abort with one of the ERROR_* messages. """
+
+
+def _checked_div(a, b):
+    if b == 0:
+        raise _EvaluationError(ERROR_DIVISION_BY_ZERO)
+    return a / b
+
+
+def _checked_factorial(b):
+    if b % 1 != 0 or b < 0:
+        raise _EvaluationError(ERROR_FACTORIAL)
+    return factorial(b)
+
+
+def _checked_root(b, a=2):
+    if b < 0:
+        raise _EvaluationError(ERROR_NEGATIVE_ROOT)
+    return root(b, a)
+
+
+# Python source templates of the operators, {a} and {b} are the left and right operand
+_BINARY_TEMPLATES = {
+    '+': '{a} + {b}',
+    '-': '{a} - {b}',
+    '*': '{a} * {b}',
+    '/': '_div({a}, {b})',
+    '^': '{a} ** {b}',
+}
+_UNARY_TEMPLATES = {
+    '!': '_factorial({b})',
+    '%': '{b} / 100',
+}
+
+_COMPILE_NAMESPACE = {
+    '_div': _checked_div,
+    '_factorial': _checked_factorial,
+    '_root': _checked_root,
+    '_format_result': _format_result,
+    '_EvaluationError': _EvaluationError,
+    '_inf': float('inf'),
+}
+
+
+# Node kind of a stack underflow, which makes evaluate_postfix raise IndexError
+UNDERFLOW = 'underflow'
+
+# Operators returning their other operand unchanged when one operand is this constant
+_IDENTITIES = {
+    '+': ((0.0, 'a'), (0.0, 'b')),
+    '-': ((0.0, 'b'),),
+    '*': ((1.0, 'a'), (1.0, 'b')),
+    '/': ((1.0, 'b'),),
+    '^': ((1.0, 'b'),),
+}
+
+
+def _apply_operator(operator, operands):
+    # Applies an operator exactly like evaluate_postfix, errors raise _EvaluationError
+    if operator == '+':
+        return plus(operands)
+    if operator == '-':
+        return minus(*operands)
+    if operator == '*':
+        return mul(*operands)
+    if operator == '/':
+        return _checked_div(*operands)
+    if operator == '^':
+        return power(*operands)
+    if operator == '!':
+        return _checked_factorial(*operands)
+    if operator == '%':
+        return percent(*operands)
+    return _checked_root(*operands)
+
+
+# Seconds per digit ** _KARATSUBA_EXPONENT of an exact integer result, fitted with some
+# margin to math.factorial and integer powers
+_SECONDS_PER_DIGIT = 5e-10
+_KARATSUBA_EXPONENT = math.log2(3)
+_LOG10_2 = math.log10(2)
+_BYTES_PER_DIGIT = math.log2(10) / 8
+
+
+def estimate_result_digits(operator, operands):
+    """ Estimates the size of the exact integer an operator would produce.
+
+    Only factorials, and the operators combining two of their integer results, are
+    computed exactly; everything else produces a float of constant size. The estimate is
+    an upper bound derived from logarithms and bit lengths without doing the operation.
+
+    Args:
+        operator (str): The operator, as in a postfix expression.
+        operands (tuple): The operand values in the order of _apply_operator.
+
+    Returns:
+        float: Decimal digits of the result, 0 for float results and invalid operands.
+    """
+    try:
+        if operator == '!':
+            n = operands[0]
+            if n % 1 != 0 or n < 0:
+                return 0
+            return math.lgamma(n + 1) / math.log(10) + 1
+        if operator not in ('+', '-', '*', '^') or len(operands) != 2:
+            return 0
+        a, b = operands
+        if a.__class__ is not int or b.__class__ is not int:
+            return 0
+        if operator == '^':
+            return b * math.log10(abs(a)) + 1 if b > 0 and a else 0
+        digits_a = a.bit_length() * _LOG10_2 + 1
+        digits_b = b.bit_length() * _LOG10_2 + 1
+        return digits_a + digits_b if operator == '*' else max(digits_a, digits_b) + 1
+    except OverflowError:
+        return math.inf
+
+
+class EvaluationBudget:
+    """ Limits on the resources an evaluation may use.
+
+    Before every operator the size of its exact result is estimated with
+    estimate_result_digits, and from it the memory and time the operation would take.
+    An operation over budget is never started: it is either computed in floating point
+    or the evaluation ends with ERROR_BUDGET. Limits set to None are not enforced.
+
+    Attributes:
+        max_digits (float): Largest exact integer result in decimal digits.
+        max_seconds (float): Longest evaluation in seconds, estimated before every
+            operator and also measured between them.
+        max_memory (float): Largest exact integer result in bytes.
+        approximate (bool): Compute operations over budget in floating point instead of
+            failing; results beyond the float range still fail with ERROR_BUDGET.
+    """
+
+    def __init__(self, max_digits=None, max_seconds=None, max_memory=None, approximate=False):
+        """ Initialize the budget, see the attributes. """
+        self.max_digits = max_digits
+        self.max_seconds = max_seconds
+        self.max_memory = max_memory
+        self.approximate = approximate
+
+    def __repr__(self):
+        return (f"EvaluationBudget(max_digits={self.max_digits!r}, max_seconds={self.max_seconds!r}, "
+                f"max_memory={self.max_memory!r}, approximate={self.approximate!r})")
+
+    def exceeds(self, digits, elapsed=0.0):
+        """ Checks whether an operation fits in the budget.
+
+        Args:
+            digits (float): Estimated size of its result, see estimate_result_digits.
+            elapsed (float, optional): Seconds already spent on the evaluation.
+
+        Returns:
+            bool: True if the operation would exceed one of the limits.
+        """
+        if self.max_digits is not None and digits > self.max_digits:
+            return True
+        if self.max_memory is not None and digits * _BYTES_PER_DIGIT > self.max_memory:
+            return True
+        return (self.max_seconds is not None and
+                elapsed + _SECONDS_PER_DIGIT * digits ** _KARATSUBA_EXPONENT > self.max_seconds)
+
+    def apply(self, operator, operands, started):
+        """ Applies an operator like evaluate_postfix, within the budget.
+
+        Args:
+            operator (str): The operator.
+            operands (tuple): The operand values in the order of _apply_operator.
+            started (float): time.perf_counter() when the evaluation began.
+
+        Returns:
+            The result of the operator, a float if it had to be approximated.
+
+        Raises:
+            _EvaluationError: With ERROR_BUDGET if the operation does not fit, or with
+                the error of an invalid operation.
+        """
+        elapsed = 0.0
+        if self.max_seconds is not None:
+            elapsed = time.perf_counter() - started
+            if elapsed > self.max_seconds:
+                raise _EvaluationError(ERROR_BUDGET)
+        if not self.exceeds(estimate_result_digits(operator, operands), elapsed):
+            return _apply_operator(operator, operands)
+        if not self.approximate:
+            raise _EvaluationError(ERROR_BUDGET)
+        return _approximate_operator(operator, operands)
+
+
+def _approximate_operator(operator, operands):
+    # Computes an operator in floating point instead of exactly
+    try:
+        if operator == '!':
+            n = operands[0]
+            if n % 1 != 0 or n < 0:
+                raise _EvaluationError(ERROR_FACTORIAL)
+            return math.exp(math.lgamma(n + 1))
+        result = _apply_operator(operator, tuple(float(operand) for operand in operands))
+    except OverflowError:
+        raise _EvaluationError(ERROR_BUDGET) from None
+    if math.isinf(result):
+        raise _EvaluationError(ERROR_BUDGET)
+    return result
+
+
+def _evaluate_postfix_budgeted(postfix, budget):
+    # evaluate_postfix with every operator applied through budget.apply
+    started = time.perf_counter()
+    stack = []
+    result = None
+    try:
+        for token in postfix:
+            if token.__class__ is not str:
+                stack.append(token)
+            elif token not in _PRECEDENCE:
+                stack.append(float(token))
+            else:
+                b = stack.pop()
+                if token in _BINARY_TEMPLATES:
+                    operands = (stack.pop(), b)
+                elif token == '√' and stack:
+                    operands = (b, stack.pop())
+                elif token in _UNARY_TEMPLATES or token == '√':
+                    operands = (b,)
+                elif result is None:
+                    return ERROR_INVALID_EXPRESSION
+                else:
+                    # Like evaluate_postfix, an unmatched '(' repeats the previous result
+                    stack.append(result)
+                    continue
+                result = budget.apply(token, operands, started)
+                stack.append(result)
+    except _EvaluationError as error:
+        return str(error)
+    result = stack.pop()
+    if len(stack) != 0:
+        return ERROR_INVALID_EXPRESSION
+    return _format_result(result)
+
+
+class ExpressionDAG:
+    """ A postfix expression as a graph of distinct subexpressions.
+
+    Identical subexpressions are stored once (hash-consing), operators with only constant
+    operands are folded into constants and identities such as x * 1 or x + 0 are removed.
+    Nodes are ordered so that evaluating them in order reports the same first error as
+    evaluate_postfix, and only each distinct subexpression is evaluated once.
+
+    Attributes:
+        nodes (list): Tuples (NUMBER, value), (VARIABLE, name), (UNDERFLOW,) or
+            (operator, operand indices...), operands always precede their users.
+        roots (list): Indices of the nodes left on the stack at the end.
+    """
+
+    def __init__(self, postfix):
+        """ Builds the graph of a postfix expression as produced by infix_to_postfix.
+
+        Raises:
+            ValueError: If the postfix contains tokens without an operator meaning,
+                such as unbalanced parentheses.
+        """
+        self.nodes = []
+        self._index = {}
+        # Folded value of every node, or _EvaluationError for nodes evaluated later
+        self._constants = []
+        stack = []
+        for token in postfix:
+            if token.__class__ is Variable:
+                stack.append(self._add((VARIABLE, token.name), _EvaluationError))
+            elif token.__class__ is not str:
+                stack.append(self._constant(token))
+            elif token not in _PRECEDENCE:
+                stack.append(self._constant(float(token)))
+            elif token in _BINARY_TEMPLATES:
+                if len(stack) < 2:
+                    stack = [self._add((UNDERFLOW,), _EvaluationError)]
+                    break
+                b = stack.pop()
+                stack.append(self._operation(token, (stack.pop(), b)))
+            elif token in _UNARY_TEMPLATES or token == '√':
+                if not stack:
+                    stack = [self._add((UNDERFLOW,), _EvaluationError)]
+                    break
+                b = stack.pop()
+                operands = (b, stack.pop()) if token == '√' and stack else (b,)
+                stack.append(self._operation(token, operands))
+            else:
+                raise ValueError(f"Unsupported postfix token: {token!r}")
+        self.roots = [] if stack and self.nodes[stack[-1]][0] == UNDERFLOW else stack
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _add(self, node, constant):
+        index = self._index.get(node)
+        if index is None:
+            index = len(self.nodes)
+            self.nodes.append(node)
+            self._constants.append(constant)
+            self._index[node] = index
+        return index
+
+    def _constant(self, value):
+        # Integers (factorials) and floats of equal value behave differently, as do 0.0 and -0.0
+        if value.__class__ is int:
+            return self._add((NUMBER, value), value)
+        return self._add((NUMBER, value, math.copysign(1.0, value)), value)
+
+    def _is_constant(self, index, value):
+        node = self.nodes[index]
+        return node[0] == NUMBER and len(node) == 3 and node[1] == value and node[2] > 0
+
+    def _operation(self, operator, operands):
+        constants = [self._constants[index] for index in operands]
+        if _EvaluationError not in constants:
+            try:
+                value = _apply_operator(operator, constants)
+            except Exception:
+                # Left to evaluation, so the error is reported in evaluation order
+                value = None
+            if value.__class__ in (int, float):
+                return self._constant(value)
+        for value, side in _IDENTITIES.get(operator, ()):
+            kept, dropped = operands if side == 'b' else operands[::-1]
+            # Integer operands are kept out, int * 1.0 would turn them into floats
+            if self._is_constant(dropped, value) and self._constants[kept].__class__ is not int \
+                    and not self._may_be_int(kept):
+                return kept
+        return self._add((operator,) + tuple(operands), _EvaluationError)
+
+    def _may_be_int(self, index):
+        # Only factorials produce integers, every other operator results in a float
+        return self.nodes[index][0] == '!'
+
+    def evaluate(self, values=None):
+        """ Evaluates every distinct subexpression once.
+
+        Args:
+            values (dict, optional): Values of the variables by name.
+
+        Returns:
+            float or str: The result formatted like evaluate_postfix, or an error message.
+
+        Raises:
+            IndexError: Where evaluate_postfix raises it for a malformed expression.
+        """
+        results = list(self._constants)
+        nodes = self.nodes
+        try:
+            for index, node in enumerate(nodes):
+                if results[index] is not _EvaluationError:
+                    continue
+                kind = node[0]
+                if kind == VARIABLE:
+                    results[index] = values[node[1]]
+                elif kind == UNDERFLOW:
+                    raise IndexError("pop from empty list")
+                else:
+                    results[index] = _apply_operator(kind, [results[operand] for operand in node[1:]])
+        except _EvaluationError as error:
+            return str(error)
+        if not self.roots:
+            raise IndexError("pop from empty list")
+        if len(self.roots) != 1:
+            return ERROR_INVALID_EXPRESSION
+        return _format_result(results[self.roots[0]])
+
+
+# Evaluation state of IncrementalEvaluator for expressions that cannot be evaluated yet
+_INCOMPLETE = object()
+
+
+class IncrementalEvaluator:
+    """ Evaluates an expression that is edited at its end, e.g. while it is being typed.
+
+    For every token the shunting-yard operator stack is kept, and for every postfix token
+    the evaluation stack, both as immutable linked lists sharing their common parts. An
+    update re-processes only the tokens after the first changed character, so appending
+    or deleting at the end costs time proportional to the change, not to the expression.
+
+    Attributes:
+        text (str): The expression passed to the last update.
+        budget (EvaluationBudget): Resource limits of every operator, or None.
+    """
+
+    def __init__(self, budget=None):
+        """ Initialize the evaluator with an empty expression.
+
+        Args:
+            budget (EvaluationBudget, optional): Resource limits, applied to each operator
+                separately since the operators are evaluated as they are typed.
+        """
+        self.text = ''
+        self.budget = budget
+        # Per token: (start, end, kind, postfix length, operator stack) after processing it
+        self._tokens = []
+        # Per postfix token: evaluation stack as (value, rest) pairs, None when empty, an
+        # error message or _INCOMPLETE
+        self._states = []
+
+    def update(self, text):
+        """ Replaces the expression and returns its preview result.
+
+        Args:
+            text (str): The new expression, typically the old one with a changed end.
+
+        Returns:
+            float or str or None: See preview.
+        """
+        tokens = self._tokens
+        common = _common_prefix_length(self.text, text)
+        # A token followed by a changed character might continue (e.g. a number being typed)
+        while tokens and tokens[-1][1] >= common:
+            tokens.pop()
+        while tokens and tokens[-1][2] == NUMBER and \
+                _TOKEN_RE.match(text, tokens[-1][0]).end() != tokens[-1][1]:
+            tokens.pop()
+
+        if tokens:
+            _, _, previous_kind, postfix_length, stack = tokens[-1]
+        else:
+            previous_kind, postfix_length, stack = None, 0, None
+        del self._states[postfix_length:]
+
+        for match in _TOKEN_RE.finditer(text, tokens[-1][1] if tokens else 0):
+            kind = match.lastgroup
+            value = match.group()
+            if stack is _INCOMPLETE:
+                pass
+            elif kind == NUMBER:
+                self._emit(float(value))
+            elif kind == OPERATOR:
+                if value == '-' and previous_kind not in _OPERAND_KINDS:
+                    self._emit(0.0)
+                while (stack is not None and stack[0] != '(' and
+                       (_PRECEDENCE[stack[0]] > _PRECEDENCE[value] or
+                        (_PRECEDENCE[stack[0]] == _PRECEDENCE[value] and value not in _RIGHT_ASSOCIATIVE))):
+                    self._emit(stack[0])
+                    stack = stack[1]
+                stack = (value, stack)
+            elif kind == LPAREN:
+                stack = (value, stack)
+            else:
+                while stack is not None and stack[0] != '(':
+                    self._emit(stack[0])
+                    stack = stack[1]
+                # An unmatched parenthesis makes infix_to_postfix fail
+                stack = stack[1] if stack is not None else _INCOMPLETE
+            previous_kind = kind
+            tokens.append((match.start(), match.end(), kind, len(self._states), stack))
+        self.text = text
+        return self.preview()
 
-    expression = split_by_expression_parts(expression)
-    postfix = infix_to_postfix(expression)
-    return evaluate_postfix(postfix)
+    def preview(self):
+        """ Evaluates the expression as if it was complete, closing open parentheses.
+
+        Returns:
+            float or str or None: The result formatted like evaluate_postfix, an error
+            message, or None if the expression is empty or incomplete.
+        """
+        if not self._tokens or self._tokens[-1][4] is _INCOMPLETE:
+            return None
+        state = self._states[-1] if self._states else None
+        stack = self._tokens[-1][4]
+        while stack is not None:
+            if stack[0] != '(':
+                state = _evaluation_step(state, stack[0], self.budget)
+            stack = stack[1]
+        if state.__class__ is str:
+            return state
+        if state is None or state is _INCOMPLETE:
+            return None
+        if state[1] is not None:
+            return ERROR_INVALID_EXPRESSION
+        try:
+            return _format_result(state[0])
+        except TypeError:
+            return None
+
+    def _emit(self, token):
+        self._states.append(_evaluation_step(self._states[-1] if self._states else None, token, self.budget))
+
+
+def _common_prefix_length(old, new):
+    # Length of the common start of two texts. Typing and deleting at the end are checked
+    # directly, other edits by a binary search comparing slices in C.
+    if new.startswith(old):
+        return len(old)
+    if old.startswith(new):
+        return len(new)
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[:middle] == new[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _evaluation_step(state, token, budget=None):
+    # Applies one postfix token to an IncrementalEvaluator evaluation state
+    if state.__class__ is str or state is _INCOMPLETE:
+        return state
+    if token.__class__ is not str:
+        return token, state
+    if state is None:
+        return _INCOMPLETE
+    b, state = state
+    if token in _BINARY_TEMPLATES:
+        if state is None:
+            return _INCOMPLETE
+        a, state = state
+        operands = (a, b)
+    elif token == '√' and state is not None:
+        a, state = state
+        operands = (b, a)
+    else:
+        operands = (b,)
+    try:
+        if budget is not None:
+            return budget.apply(token, operands, time.perf_counter()), state
+        return _apply_operator(token, operands), state
+    except _EvaluationError as error:
+        return str(error)
+    except ZeroDivisionError:
+        return ERROR_DIVISION_BY_ZERO
+    except OverflowError:
+        return ERROR_OVERFLOW
+
+
+class CompiledExpression:
+    """ An infix expression parsed once and compiled into a Python function.
+
+    Calling the object evaluates the expression for the given variable values, in the
+    order of variables, with the same results and error messages as evaluate_expression.
+
+    Attributes:
+        expression (str): The original infix expression.
+        variables (tuple): Names of the variables, in call order.
+        postfix (tuple): The postfix form of the expression.
+        dag (ExpressionDAG): The optimized graph the function was generated from.
+        source (str): The generated Python source of function.
+        function (function): The compiled function, slightly faster to call directly.
+    """
+
+    def __init__(self, expression, variables, postfix, dag, source, function):
+        """ Initialize the compiled expression, see compile_expression. """
+        self.expression = expression
+        self.variables = variables
+        self.postfix = postfix
+        self.dag = dag
+        self.source = source
+        self.function = function
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args, **kwargs)
+
+    def __repr__(self):
+        return f"CompiledExpression({self.expression!r}, variables={self.variables!r})"
+
+
+def _generate_source(dag, namespace):
+    # Emits straight-line code with one statement per distinct subexpression. Locals are
+    # reused once their value is no longer needed, so the expression size is not limited
+    # by nesting depth and the number of locals stays at the peak of live values.
+    if len(dag.roots) != 1:
+        raise ValueError(ERROR_INVALID_EXPRESSION)
+    last_use = {}
+    for index, node in enumerate(dag.nodes):
+        if node[0] == UNDERFLOW:
+            raise ValueError(ERROR_INVALID_EXPRESSION)
+        if node[0] not in (NUMBER, VARIABLE):
+            for operand in node[1:]:
+                last_use[operand] = index
+    last_use[dag.roots[0]] = len(dag.nodes)
+
+    names = {}
+    free = []
+    registers = 0
+    lines = []
+    for index, node in enumerate(dag.nodes):
+        kind = node[0]
+        if kind == VARIABLE:
+            names[index] = node[1]
+        elif kind == NUMBER:
+            value = node[1]
+            if value.__class__ is float and math.isfinite(value):
+                # Parenthesized so that folded negative constants keep their sign under **
+                names[index] = repr(value) if math.copysign(1.0, value) > 0 else f"({value!r})"
+            else:
+                names[index] = f"_k{len(namespace)}"
+                namespace[names[index]] = value
+        elif index in last_use:
+            operands = [names[operand] for operand in node[1:]]
+            for operand in set(node[1:]):
+                if last_use[operand] == index and names[operand].startswith('_s'):
+                    free.append(names[operand])
+            if free:
+                target = free.pop()
+            else:
+                target = f"_s{registers}"
+                registers += 1
+            if kind in _BINARY_TEMPLATES:
+                code = _BINARY_TEMPLATES[kind].format(a=operands[0], b=operands[1])
+            elif kind in _UNARY_TEMPLATES:
+                code = _UNARY_TEMPLATES[kind].format(b=operands[0])
+            else:
+                code = f"_root({', '.join(operands)})"
+            lines.append(f"{target} = {code}")
+            names[index] = target
+    lines.append(f"return _format_result({names[dag.roots[0]]})")
+    return "".join(f"        {line}\n" for line in lines)
+
+
+def compile_expression(expression, variables=()):
+    """ Parses an infix expression once and compiles it into a reusable callable.
+
+    The expression may refer to the given variables by name. The returned object
+    evaluates it without any parsing or operator dispatch, which makes repeated
+    evaluation with different inputs much cheaper than evaluate_expression. Code is
+    generated from an ExpressionDAG, so constant parts are precomputed and repeated
+    subexpressions are evaluated once.
+
+    Args:
+        expression (str): The infix expression, e.g. "2 * x ^ 2 + y".
+        variables (tuple, optional): Variable names, in the order the callable
+            accepts their values.
+
+    Returns:
+        CompiledExpression: The callable compiled expression.
+
+    Raises:
+        ValueError: If a variable name is invalid or the expression is malformed.
+    """
+    variables = tuple(variables)
+    for name in variables:
+        if not _VARIABLE_NAME_RE.fullmatch(name) or keyword.iskeyword(name):
+            raise ValueError(f"Invalid variable name: {name!r}")
+    if len(set(variables)) != len(variables):
+        raise ValueError("Variable names must be unique.")
+
+    tokens = tokenize(normalize_expression(expression), variables)
+    try:
+        postfix = tuple(infix_to_postfix(tokens))
+        dag = ExpressionDAG(postfix)
+    except (IndexError, ValueError):
+        raise ValueError(ERROR_INVALID_EXPRESSION) from None
+    namespace = dict(_COMPILE_NAMESPACE)
+    source = (f"def _compiled({', '.join(variables)}):\n"
+              f"    try:\n{_generate_source(dag, namespace)}"
+              f"    except _EvaluationError as error:\n"
+              f"        return str(error)\n")
+    exec(compile(source, '<compiled expression>', 'exec'), namespace)
+    return CompiledExpression(expression, variables, postfix, dag, source, namespace['_compiled'])
+
+
+# Opcodes of a PostfixProgram, OP_PUSH pushes the next number of the constant pool
+OP_PUSH = 0
+OP_ADD = 1
+OP_SUB = 2
+OP_MUL = 3
+OP_DIV = 4
+OP_POW = 5
+OP_FACTORIAL = 6
+OP_ROOT = 7
+OP_PERCENT = 8
+
+_OPCODES = {'+': OP_ADD, '-': OP_SUB, '*': OP_MUL, '/': OP_DIV, '^': OP_POW,
+            '!': OP_FACTORIAL, '√': OP_ROOT, '%': OP_PERCENT}
+_OPERATORS = {opcode: operator for operator, opcode in _OPCODES.items()}
+
+
+class PostfixProgram:
+    """ A postfix expression compiled into an opcode stream and a constant pool.
+
+    Every token takes one byte of opcodes and every number another eight bytes of
+    constants, instead of a list slot plus a boxed float per token. evaluate dispatches
+    on the integer opcodes and returns the same results and errors as evaluate_postfix.
+
+    Attributes:
+        opcodes (array.array): One OP_* code per postfix token, typecode 'b'.
+        constants (array.array): The numbers in the order they are pushed, typecode 'd'.
+    """
+
+    def __init__(self, opcodes, constants):
+        """ Initialize the program, see compile_postfix. """
+        self.opcodes = opcodes
+        self.constants = constants
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    @property
+    def nbytes(self):
+        """ int: Size of the opcode and constant buffers in bytes. """
+        return (len(self.opcodes) * self.opcodes.itemsize +
+                len(self.constants) * self.constants.itemsize)
+
+    def postfix(self):
+        """ Returns the program as a postfix list like infix_to_postfix. """
+        constants = iter(self.constants)
+        return [next(constants) if opcode == OP_PUSH else _OPERATORS[opcode] for opcode in self.opcodes]
+
+    def evaluate(self):
+        """ Evaluates the program.
+
+        Returns:
+            float or str: The result of the evaluation or an error message.
+        """
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        constant = iter(self.constants).__next__
+        for opcode in self.opcodes:
+            if opcode == OP_PUSH:
+                push(constant())
+            elif opcode == OP_ADD:
+                b = pop()
+                # Like sum, which plus uses, 0.0 + -0.0 is 0.0
+                stack[-1] = 0 + stack[-1] + b
+            elif opcode == OP_SUB:
+                b = pop()
+                stack[-1] = stack[-1] - b
+            elif opcode == OP_MUL:
+                b = pop()
+                stack[-1] = stack[-1] * b
+            elif opcode == OP_DIV:
+                b = pop()
+                a = stack[-1]
+                if b == 0:
+                    return ERROR_DIVISION_BY_ZERO
+                stack[-1] = a / b
+            elif opcode == OP_POW:
+                b = pop()
+                stack[-1] = stack[-1] ** b
+            elif opcode == OP_FACTORIAL:
+                b = pop()
+                if b % 1 != 0 or b < 0:
+                    return ERROR_FACTORIAL
+                push(factorial(b))
+            elif opcode == OP_ROOT:
+                b = pop()
+                if b < 0:
+                    return ERROR_NEGATIVE_ROOT
+                if stack:
+                    stack[-1] = root(b, stack[-1])
+                else:
+                    push(root(b))
+            else:
+                stack[-1] = stack[-1] / 100
+        result = pop()
+        if stack:
+            return ERROR_INVALID_EXPRESSION
+        return _format_result(result)
+
+
+def compile_postfix(postfix):
+    """ Compiles a postfix expression into a compact PostfixProgram.
+
+    Args:
+        postfix (iterable): The postfix expression as produced by infix_to_postfix.
+            Numbers may also be given as strings.
+
+    Returns:
+        PostfixProgram: The compiled program.
+
+    Raises:
+        ValueError: If the postfix contains variables, integers (which a float64 pool
+            cannot hold exactly) or unbalanced parentheses.
+    """
+    opcodes = array('b')
+    constants = array('d')
+    emit = opcodes.append
+    pool = constants.append
+    for token in postfix:
+        if token.__class__ is float:
+            emit(OP_PUSH)
+            pool(token)
+        elif token.__class__ is not str:
+            raise ValueError(f"Unsupported postfix token: {token!r}")
+        elif token in _OPCODES:
+            emit(_OPCODES[token])
+        elif token in _PRECEDENCE:
+            raise ValueError(f"Unsupported postfix token: {token!r}")
+        else:
+            emit(OP_PUSH)
+            pool(float(token))
+    return PostfixProgram(opcodes, constants)
+
+
+# Error codes reported per element by evaluate_vectorized, indexing VECTOR_ERROR_MESSAGES
+VECTOR_OK = 0
+VECTOR_DIVISION_BY_ZERO = 1
+VECTOR_FACTORIAL = 2
+VECTOR_NEGATIVE_ROOT = 3
+# A negative base raised to a fractional power, a complex number the scalar path rejects
+VECTOR_INVALID = 4
+VECTOR_ERROR_MESSAGES = (None, ERROR_DIVISION_BY_ZERO, ERROR_FACTORIAL, ERROR_NEGATIVE_ROOT,
+                         ERROR_INVALID_EXPRESSION)
+
+# Largest n whose factorial is representable as float64
+_MAX_FLOAT_FACTORIAL = 170
+
+
+def evaluate_vectorized(compiled, *arrays):
+    """ Evaluates a compiled expression over whole NumPy arrays at once.
+
+    The postfix program of the expression is executed with array operations, so the
+    cost per element is a handful of machine operations instead of a Python call. Like
+    evaluate_postfix, only the first error in evaluation order is reported for each element.
+    Values are not rounded or formatted for display. Requires NumPy.
+
+    Args:
+        compiled (CompiledExpression): The expression returned by compile_expression.
+        *arrays: One array (or scalar) per variable, in the order of compiled.variables.
+            They are broadcast against each other.
+
+    Returns:
+        tuple: (values, errors) where values is a float64 array of results (NaN where an
+        error occurred) and errors is a uint8 array of VECTOR_* codes, non-zero marking
+        the elements evaluate_postfix would report as an error. VECTOR_ERROR_MESSAGES
+        maps the codes to the error messages.
+
+    Raises:
+        ValueError: If the number of arrays does not match the variables.
+    """
+    import numpy as np
+
+    if len(arrays) != len(compiled.variables):
+        raise ValueError(f"Expected {len(compiled.variables)} arrays, got {len(arrays)}.")
+    arrays = np.broadcast_arrays(*(np.asarray(array, dtype=np.float64) for array in arrays))
+    shape = arrays[0].shape if arrays else ()
+    values_by_name = dict(zip(compiled.variables, arrays))
+    errors = np.zeros(shape, dtype=np.uint8)
+
+    def fail(condition, code):
+        np.copyto(errors, code, where=np.logical_and(condition, errors == VECTOR_OK))
+
+    stack = []
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for token in compiled.postfix:
+            if token.__class__ is Variable:
+                stack.append(values_by_name[token.name])
+                continue
+            if token.__class__ is not str:
+                stack.append(np.float64(token))
+                continue
+            b = stack.pop()
+            if token == '+':
+                result = stack.pop() + b
+            elif token == '-':
+                result = stack.pop() - b
+            elif token == '*':
+                result = stack.pop() * b
+            elif token == '/':
+                fail(b == 0, VECTOR_DIVISION_BY_ZERO)
+                result = np.divide(stack.pop(), b)
+            elif token == '^':
+                a = stack.pop()
+                fail((a < 0) & (b % 1 != 0), VECTOR_INVALID)
+                result = np.power(a, b)
+            elif token == '!':
+                invalid = (b % 1 != 0) | (b < 0)
+                fail(invalid, VECTOR_FACTORIAL)
+                table = _float_factorials(np)
+                index = np.clip(np.where(invalid, 0, b), 0, _MAX_FLOAT_FACTORIAL + 1).astype(np.intp)
+                result = table[index]
+            elif token == '√':
+                fail(b < 0, VECTOR_NEGATIVE_ROOT)
+                degree = stack.pop() if stack else np.float64(2)
+                fail(degree == 0, VECTOR_DIVISION_BY_ZERO)
+                result = np.power(b, np.divide(1, degree))
+            elif token == '%':
+                result = b / 100
+            stack.append(result)
+
+    values = np.array(np.broadcast_to(stack.pop(), shape), dtype=np.float64)
+    values[errors != VECTOR_OK] = np.nan
+    return values, errors
+
+
+_float_factorial_table = None
+
+
+def _float_factorials(np):
+    # Lookup table of n! as float64 for n up to _MAX_FLOAT_FACTORIAL, followed by inf
+    global _float_factorial_table
+    if _float_factorial_table is None:
+        table = [float(factorial(n)) for n in range(_MAX_FLOAT_FACTORIAL + 1)]
+        _float_factorial_table = np.array(table + [float('inf')], dtype=np.float64)
+    return _float_factorial_table
 
 
 def plus(nums):
@@ -208,15 +1930,27 @@ def power(a, b):
 def factorial(n):
     """Calculate the factorial of a non-negative integer.
 
+    Recently computed factorials are remembered, so repeated evaluation is free.
+
     Args:
         n (int): The non-negative integer.
 
     Returns:
         int: The factorial of n.
     """
-    result = 1
-    for i in range(1, int(n) + 1):
-        result *= i
+    return _factorial(int(n))
+
+
+# Recently computed factorials, limited by their size in bytes
+_factorial_memo = ExpressionCache(FACTORIAL_MEMO_BYTES, weigh=lambda value: value.bit_length() // 8 + 1)
+
+
+def _factorial(n):
+    result = _factorial_memo.get(n)
+    if result is None:
+        # math.factorial multiplies by divide and conquer (binary splitting) in C
+        result = math.factorial(n)
+        _factorial_memo.put(n, result)
     return result
 
 
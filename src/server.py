@@ -0,0 +1,341 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: This module provides a headless evaluation server. Clients send line-delimited
+JSON requests over TCP or a Unix socket; concurrent requests are coalesced into
+micro-batches which are evaluated in a process pool, so the event loop stays responsive.
+
+Requests and responses, one JSON object per line ("id" is optional and echoed back):
+    {"id": 1, "expression": "1 + 2"}           -> {"id": 1, "result": 3}
+    {"id": 2, "expressions": ["2 ^ 3", "1/0"]} -> {"id": 2, "results": [8, "Error: Division by zero"]}
+    {"id": 3, "command": "stats"}              -> {"id": 3, "stats": {...}}
+
+Infinite and NaN results, which JSON cannot represent, are sent as the strings "inf",
+"-inf" and "nan".
+
+@file server.py
+@date 2026-10-18
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import math_logic as ml
+
+DEFAULT_PORT = 8765
+# Most expressions evaluated by a worker at once
+DEFAULT_MAX_BATCH = 256
+# Seconds a request waits for others to share its batch
+DEFAULT_MAX_DELAY = 0.002
+# Number of recent request latencies the percentiles are computed from
+LATENCY_HISTORY = 10000
+# Requests of one connection processed concurrently
+MAX_PIPELINED = 1024
+# Longest request line in bytes, longer requests are answered with an error
+DEFAULT_REQUEST_LIMIT = 32 << 20
+PERCENTILES = (50, 90, 99)
+
+
+# Returned by EvaluationServer._read_request for a request over the limit
+_TOO_LARGE = object()
+
+
+def _evaluate_batch(expressions, budget):
+    # Runs in a worker process
+    return ml.evaluate_many(expressions, workers=1, budget=budget)
+
+
+def _json_result(result):
+    # A result representable in strict JSON, non-finite floats become 'inf', '-inf' or 'nan'
+    if result.__class__ is float and not math.isfinite(result):
+        return str(result)
+    return result
+
+
+class EvaluationServer:
+    """ Evaluates expressions for many concurrent clients in micro-batches.
+
+    Every expression is queued; a batching task collects the queued expressions for at
+    most max_delay seconds (or until max_batch are waiting) and sends them to a worker
+    process as one batch. At most one batch per worker is in flight, so the queue depth
+    reflects the load the pool cannot keep up with.
+
+    Attributes:
+        workers (int): Number of worker processes.
+        max_batch (int): Most expressions in one batch.
+        max_delay (float): Seconds a batch waits to be filled.
+        budget (math_logic.EvaluationBudget): Resource limits of every evaluation, or None.
+        request_limit (int): Longest request line in bytes.
+    """
+
+    def __init__(self, workers=None, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY, budget=None,
+                 request_limit=DEFAULT_REQUEST_LIMIT):
+        """ Initialize the server, the worker processes are started by start. """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.budget = budget
+        self.request_limit = request_limit
+        self._executor = None
+        self._queue = None
+        self._slots = None
+        self._tasks = set()
+        self._servers = []
+        self._in_flight = 0
+        self._latencies = deque(maxlen=LATENCY_HISTORY)
+        self._requests = 0
+        self._expressions = 0
+        self._batches = 0
+
+    async def start(self, host=None, port=None, path=None):
+        """ Starts the worker pool and listens for clients.
+
+        Args:
+            host (str, optional): The TCP address to listen on.
+            port (int, optional): The TCP port, DEFAULT_PORT if only a host is given, 0
+                for any free port (see addresses).
+            path (str, optional): The path of a Unix socket to listen on.
+        """
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._spawn(self._batch_loop())
+        if path is not None:
+            self._servers.append(await asyncio.start_unix_server(self.handle_connection, path,
+                                                                 limit=self.request_limit))
+        if host is not None or port is not None or path is None:
+            self._servers.append(await asyncio.start_server(self.handle_connection, host or '127.0.0.1',
+                                                            DEFAULT_PORT if port is None else port,
+                                                            limit=self.request_limit))
+
+    def addresses(self):
+        """ Returns the addresses the server listens on, e.g. ('127.0.0.1', port) or a socket path. """
+        return [sock.getsockname() for server in self._servers for sock in server.sockets]
+
+    async def serve_forever(self):
+        """ Serves clients until cancelled. """
+        await asyncio.gather(*(server.serve_forever() for server in self._servers))
+
+    async def close(self):
+        """ Stops listening, cancels the batching and shuts the worker pool down. """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        for task in list(self._tasks):
+            task.cancel()
+        self._executor.shutdown(cancel_futures=True)
+
+    def _spawn(self, coroutine):
+        # Keeps a reference to the task, the event loop only holds a weak one
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def evaluate(self, expressions):
+        """ Evaluates expressions as part of the next batches.
+
+        Args:
+            expressions (list): The infix expressions.
+
+        Returns:
+            list: The result or error message of each expression, see
+            math_logic.evaluate_expression_safe.
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for expression in expressions:
+            future = loop.create_future()
+            self._queue.put_nowait((expression, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _batch_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._slots.acquire()
+            self._in_flight += len(batch)
+            self._spawn(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, _evaluate_batch,
+                                                 [expression for expression, _ in batch], self.budget)
+        except Exception as error:
+            if isinstance(error, BrokenProcessPool):
+                # A worker died, e.g. it ran out of memory; later batches get a new pool
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._in_flight -= len(batch)
+            self._batches += 1
+            self._slots.release()
+
+    async def handle_connection(self, reader, writer):
+        """ Answers the requests of one client until it disconnects.
+
+        Requests are processed concurrently, so responses may arrive out of order and
+        carry the id of their request.
+        """
+        pipelined = asyncio.Semaphore(MAX_PIPELINED)
+        pending = set()
+        try:
+            while True:
+                line = await self._read_request(reader)
+                if line is _TOO_LARGE:
+                    writer.write(json.dumps({'error': "Request too large"}, allow_nan=False).encode() + b'\n')
+                    await writer.drain()
+                    continue
+                if not line:
+                    break
+                await pipelined.acquire()
+                task = self._spawn(self._respond(line, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                task.add_done_callback(lambda _: pipelined.release())
+            if pending:
+                await asyncio.wait(pending)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        # Returns the next request line, b'' at the end of the stream or _TOO_LARGE if
+        # the line exceeds the limit, which is then skipped up to its end
+        try:
+            return await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as error:
+            return error.partial
+        except asyncio.LimitOverrunError as error:
+            consumed = error.consumed
+        while True:
+            try:
+                await reader.readexactly(consumed)
+                await reader.readuntil(b'\n')
+                return _TOO_LARGE
+            except asyncio.IncompleteReadError:
+                return _TOO_LARGE
+            except asyncio.LimitOverrunError as error:
+                consumed = error.consumed
+
+    async def _respond(self, line, writer):
+        response = await self.handle_request(line)
+        writer.write(json.dumps(response, allow_nan=False).encode() + b'\n')
+        await writer.drain()
+
+    async def handle_request(self, line):
+        """ Answers one request.
+
+        Args:
+            line (bytes or str): The JSON request.
+
+        Returns:
+            dict: The JSON response, with an 'error' key if the request was malformed or
+            could not be evaluated.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'error': "Invalid JSON"}
+        if not isinstance(request, dict):
+            return {'error': "Request must be an object"}
+        response = {'id': request['id']} if 'id' in request else {}
+        try:
+            if request.get('command') == 'stats':
+                response['stats'] = self.statistics()
+                return response
+            if isinstance(request.get('expression'), str):
+                response['result'] = _json_result((await self.evaluate([request['expression']]))[0])
+                self._expressions += 1
+            elif isinstance(request.get('expressions'), list) and \
+                    all(isinstance(expression, str) for expression in request['expressions']):
+                response['results'] = [_json_result(result) for result in await self.evaluate(request['expressions'])]
+                self._expressions += len(request['expressions'])
+            else:
+                response['error'] = "Expected 'expression', 'expressions' or 'command'"
+                return response
+        except Exception as error:
+            response['error'] = f"Evaluation failed: {error!r}"
+            return response
+        self._requests += 1
+        self._latencies.append(loop.time() - started)
+        return response
+
+    def statistics(self):
+        """ Returns the load and latency statistics of the server.
+
+        Returns:
+            dict: Counts of evaluated 'requests', 'expressions' and 'batches', the
+            'queue_depth' of expressions waiting for a batch, 'in_flight' expressions
+            being evaluated and 'latency_ms' percentiles of the recent requests.
+        """
+        latencies = sorted(self._latencies)
+        percentiles = {}
+        if latencies:
+            for percentile in PERCENTILES:
+                index = min(len(latencies) - 1, len(latencies) * percentile // 100)
+                percentiles[f'p{percentile}'] = latencies[index] * 1000
+            percentiles['max'] = latencies[-1] * 1000
+        return {
+            'requests': self._requests,
+            'expressions': self._expressions,
+            'batches': self._batches,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'in_flight': self._in_flight,
+            'workers': self.workers,
+            'latency_ms': percentiles,
+        }
+
+
+async def _serve(args):
+    budget = None
+    if args.max_digits is not None or args.max_seconds is not None:
+        budget = ml.EvaluationBudget(max_digits=args.max_digits, max_seconds=args.max_seconds)
+    server = EvaluationServer(args.workers, args.max_batch, args.max_delay / 1000, budget, args.max_request)
+    await server.start(args.host, args.port, args.unix)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden Calculator evaluation server (line-delimited JSON)")
+    parser.add_argument('--host', help="TCP address to listen on, 127.0.0.1 by default")
+    parser.add_argument('--port', type=int, help=f"TCP port to listen on, {DEFAULT_PORT} by default")
+    parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket (TCP only if --host/--port given)")
+    parser.add_argument('-j', '--workers', type=int, help="worker processes, the CPU count by default")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--max-delay', type=float, default=DEFAULT_MAX_DELAY * 1000,
+                        help="milliseconds a request waits for others to share its batch")
+    parser.add_argument('--max-request', type=int, default=DEFAULT_REQUEST_LIMIT,
+                        help="longest request line in bytes (default: %(default)s)")
+    parser.add_argument('--max-digits', type=int, help="reject results with more digits, see EvaluationBudget")
+    parser.add_argument('--max-seconds', type=float, help="reject evaluations estimated to take longer")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
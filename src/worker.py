@@ -0,0 +1,130 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: This module provides evaluation of expressions in a separate process, so that
+long computations neither block the caller nor are impossible to stop.
+
+@file worker.py
+@date 2026-10-18
+"""
+
+import multiprocessing
+import time
+
+from math_logic import evaluate_expression, normalize_expression
+
+# Worker processes start a fresh interpreter instead of forking the caller
+_CONTEXT = multiprocessing.get_context('spawn')
+
+
+def _serve(connection, cache=None):
+    """ Evaluates expressions received over a connection until it is closed.
+
+    Args:
+        connection (multiprocessing.connection.Connection): The worker end of the pipe.
+        cache (result_cache.ResultCache, optional): Persistent cache of expensive results.
+    """
+    while True:
+        try:
+            expression = connection.recv()
+        except EOFError:
+            return
+        try:
+            if cache is None:
+                outcome = (True, evaluate_expression(expression))
+            else:
+                outcome = (True, cache.evaluate(normalize_expression(expression), evaluate_expression, expression))
+        except Exception as e:
+            outcome = (False, e)
+        connection.send(outcome)
+
+
+class EvaluationWorker:
+    """ Evaluates one expression at a time in a background process.
+
+    The process is started on demand and reused between evaluations. Cancelling
+    terminates it, which stops even computations that never return to Python code.
+    Processes are spawned rather than forked, so a replacement started after a cancel
+    does not inherit the state of the caller (e.g. a running Tk interpreter).
+
+    Attributes:
+        busy (bool): Whether an evaluation is in progress.
+        started (float): time.monotonic() when the current evaluation was submitted.
+        cache (result_cache.ResultCache): Persistent cache of expensive results, or None.
+    """
+
+    def __init__(self, cache=None):
+        """ Initialize the worker without starting its process yet.
+
+        Args:
+            cache (result_cache.ResultCache, optional): Persistent cache the worker
+                looks results up in and stores expensive results to.
+        """
+        self.cache = cache
+        self.busy = False
+        self.started = None
+        self._process = None
+        self._connection = None
+
+    def start(self):
+        """ Starts the worker process if it is not running. """
+        if self._process is not None and self._process.is_alive():
+            return
+        self._connection, child = _CONTEXT.Pipe()
+        self._process = _CONTEXT.Process(target=_serve, args=(child, self.cache), daemon=True)
+        self._process.start()
+        child.close()
+
+    def submit(self, expression):
+        """ Starts evaluating an expression.
+
+        Args:
+            expression (str): The infix expression.
+
+        Raises:
+            RuntimeError: If an evaluation is already in progress.
+        """
+        if self.busy:
+            raise RuntimeError("An evaluation is already in progress.")
+        self.start()
+        self._connection.send(expression)
+        self.busy = True
+        self.started = time.monotonic()
+
+    def elapsed(self):
+        """ Returns the seconds spent on the current evaluation, 0 when idle. """
+        return time.monotonic() - self.started if self.busy else 0.0
+
+    def poll(self):
+        """ Checks whether the current evaluation has finished.
+
+        Returns:
+            tuple or None: None while the evaluation runs, otherwise (True, result) or
+            (False, exception) as raised by evaluate_expression.
+        """
+        if not self.busy:
+            return None
+        try:
+            if not self._connection.poll():
+                return None
+            outcome = self._connection.recv()
+        except (EOFError, OSError) as e:
+            # The process died, e.g. it ran out of memory
+            self.cancel()
+            return False, e
+        self.busy = False
+        return outcome
+
+    def cancel(self):
+        """ Stops the current evaluation by terminating the worker process. """
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._connection.close()
+        self._process = None
+        self._connection = None
+        self.busy = False
+
+    def close(self):
+        """ Stops the worker process. """
+        self.cancel()
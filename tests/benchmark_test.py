@@ -0,0 +1,42 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: Test module for the benchmark module. Contains test cases for the timing and the
+comparison against the stored baseline.
+
+@file benchmark_test.py
+@date 2026-10-18
+"""
+
+import benchmark
+
+
+def _results(calibration, **stages):
+    entry = {'mix': 'sum', 'size': 10, 'calibration': calibration}
+    entry.update(dict.fromkeys(benchmark.STAGES, 0.5), **stages)
+    return {'results': [entry]}
+
+
+# Tests that the reported time is the median of the runs, so one slow or lucky run does not move it.
+def test_time_call_median(monkeypatch):
+    clock = iter([0, 1, 10, 12, 20, 20.5, 30, 39, 40, 42])
+    monkeypatch.setattr(benchmark.time, 'perf_counter', lambda: next(clock))
+    calls = []
+    seconds, result = benchmark.time_call(calls.append, 'x', min_time=0, min_repeats=5)
+    assert seconds == 2 and result is None
+    assert calls == ['x'] * 5
+
+
+# Tests that slowdowns below the noise floor pass and calibrated slowdowns above the threshold fail.
+def test_compare_to_baseline():
+    baseline = _results(0.001, tokenize=0.00001, evaluate=2.0)
+    # A tokenize stage ten times slower by microseconds is timer noise
+    assert benchmark.compare_to_baseline(_results(0.001, tokenize=0.0001, evaluate=2.0), baseline) == []
+    regressions = benchmark.compare_to_baseline(_results(0.001, tokenize=0.00001, evaluate=3.0), baseline)
+    assert len(regressions) == 1 and regressions[0].startswith("sum/10/evaluate")
+    # The same times measured on a machine twice as slow are no regression
+    assert benchmark.compare_to_baseline(_results(0.002, tokenize=0.00002, evaluate=4.0), baseline) == []
+    slower = _results(0.001, tokenize=0.00001, evaluate=2.4)
+    assert benchmark.compare_to_baseline(slower, baseline, threshold=0.25) == []
+    assert benchmark.compare_to_baseline(slower, baseline, threshold=0.1) != []
+    assert benchmark.compare_to_baseline(_results(0.001), {'results': []}) == []
@@ -10,9 +10,14 @@ operations, factorial, exponentiation, and square root functions.
 @date 2024-22-04
 """
 
+import io
 import pytest
 import math
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
 
+from src import math_logic
 from src.math_logic import evaluate_expression
 
 
@@ -227,3 +232,460 @@ def test_complex_expressions(expression, expected):
         assert result == pytest.approx(expected), f"Failed on {expression} with expected {expected}"
     else:
         assert result == expected, f"Expected {expected}, but got {result}"
+
+
+# Tests that equivalent spellings of an expression share one normalized form.
+@pytest.mark.parametrize("expression, expected", [
+    ("1 + 2", "1+2"),
+    ("  3 × 4 ÷ 2 ", "3*4/2"),
+    ("1 2", "1 2"),
+    ("32  2", "32 2"),
+    ("1 \t 2 +  3", "1 2+3"),
+    ("20e + 2", "20e + 2"),
+    ("1e5  *  2", "1e5 * 2"),
+    ("2 √ 9", "2√9"),
+    ("(1 +\t2) * 3", "(1+2)*3"),
+])
+def test_normalize_expression(expression, expected):
+    assert math_logic.normalize_expression(expression) == expected
+
+
+# Tests that repeated evaluations are served from the parsed expression cache.
+def test_expression_cache_hits():
+    math_logic.clear_cache()
+    assert evaluate_expression("2 × 3") == 6
+    assert evaluate_expression("2*3") == 6
+    assert evaluate_expression("2 *  3") == 6
+    info = math_logic.cache_info()
+    assert info["misses"] == 1
+    assert info["hits"] == 2
+    assert info["size"] == 1
+
+
+# Tests that long expressions are parsed every time instead of filling the cache.
+def test_expression_cache_long_expressions():
+    math_logic.clear_cache()
+    expression = " + ".join(["1"] * math_logic.CACHE_MAX_LENGTH)
+    assert evaluate_expression(expression) == math_logic.CACHE_MAX_LENGTH
+    assert evaluate_expression(expression) == math_logic.CACHE_MAX_LENGTH
+    assert math_logic.cache_info()["size"] == 0
+    short = "+".join(["1"] * (math_logic.CACHE_MAX_LENGTH // 2))
+    assert evaluate_expression(short) == evaluate_expression(short)
+    assert math_logic.cache_info()["size"] == 1
+    math_logic.clear_cache()
+
+
+# Tests LRU eviction and resizing of the parsed expression cache.
+def test_expression_cache_eviction():
+    math_logic.clear_cache()
+    math_logic.set_cache_size(2)
+    try:
+        evaluate_expression("1 + 1")
+        evaluate_expression("2 + 2")
+        evaluate_expression("1 + 1")
+        evaluate_expression("3 + 3")
+        info = math_logic.cache_info()
+        assert info["evictions"] == 1
+        assert info["size"] == 2
+        assert evaluate_expression("2 + 2") == 4
+        assert math_logic.cache_info()["misses"] == 4
+        math_logic.clear_cache()
+        assert math_logic.cache_info()["size"] == 0
+    finally:
+        math_logic.set_cache_size(math_logic.DEFAULT_CACHE_SIZE)
+        math_logic.clear_cache()
+
+
+# Tests that the tokenizer emits typed tokens with converted numbers and positions.
+def test_tokenize():
+    tokens = math_logic.tokenize("12.5 + (3!)")
+    assert tokens == [
+        (math_logic.NUMBER, 12.5, 0),
+        (math_logic.OPERATOR, '+', 5),
+        (math_logic.LPAREN, '(', 7),
+        (math_logic.NUMBER, 3.0, 8),
+        (math_logic.OPERATOR, '!', 9),
+        (math_logic.RPAREN, ')', 10),
+    ]
+
+
+# Tests that the postfix stages still accept plain string tokens.
+def test_postfix_from_string_tokens():
+    parts = math_logic.split_by_expression_parts("-2 + 3 * 4")
+    postfix = math_logic.infix_to_postfix(parts)
+    assert postfix == [0.0, 2.0, '-', 3.0, 4.0, '*', '+']
+    assert math_logic.evaluate_postfix(postfix) == 10
+    assert math_logic.evaluate_postfix(['6', '2', '/']) == 3
+
+
+# Tests that compiled expressions match evaluate_expression for substituted inputs.
+@pytest.mark.parametrize("expression, values", [
+    ("x + y", (1, 2)),
+    ("2 * x ^ 2 + y / 3", (1.5, 4)),
+    ("(x + 2) * (y - 4) / 2", (1, 3)),
+    ("-x + y!", (3, 4)),
+    ("3√x + 2√y", (27, 16)),
+    ("x ^ y ^ 2", (2, 3)),
+    ("x / y", (1, 0)),
+    ("(x - 5)!", (2.5, 0)),
+    ("2√x", (-4, 0)),
+    ("x % + y", (50, 1)),
+    ("(0 - 2) % ^ x + y", (2, 1)),
+])
+def test_compile_expression(expression, values):
+    compiled = math_logic.compile_expression(expression, ("x", "y"))
+    x, y = (f"({value})" if value < 0 else str(value) for value in values)
+    substituted = expression.replace("x", x).replace("y", y)
+    assert compiled(*values) == evaluate_expression(substituted)
+
+
+# Tests variable name validation and malformed expressions in compile_expression.
+@pytest.mark.parametrize("expression, variables", [
+    ("x + 1", ("1x",)),
+    ("x + 1", ("x", "x")),
+    ("x + 1", ("if",)),
+    ("x +", ("x",)),
+    ("x y", ("x", "y")),
+    ("", ()),
+])
+def test_compile_expression_invalid(expression, variables):
+    with pytest.raises(ValueError):
+        math_logic.compile_expression(expression, variables)
+
+
+# Tests vectorized evaluation against element-wise evaluation of a compiled expression.
+@pytest.mark.parametrize("expression", [
+    "x + y * 2",
+    "x / y",
+    "(x - y)!",
+    "3√x + 2√y",
+    "x ^ 2 - y % ",
+])
+def test_evaluate_vectorized(expression):
+    np = pytest.importorskip("numpy")
+    x = np.array([8.0, -8.0, 4.0, 0.0, 5.5, 27.0])
+    y = np.array([2.0, 0.0, 4.0, 1.0, 0.5, -1.0])
+    compiled = math_logic.compile_expression(expression, ("x", "y"))
+    values, errors = math_logic.evaluate_vectorized(compiled, x, y)
+    for i in range(len(x)):
+        expected = compiled(x[i], y[i])
+        if isinstance(expected, str) and expected.startswith("Error"):
+            assert math_logic.VECTOR_ERROR_MESSAGES[errors[i]] == expected
+            assert np.isnan(values[i])
+        else:
+            assert errors[i] == math_logic.VECTOR_OK
+            # Large results are formatted to three significant digits by evaluate_postfix
+            rel = 1e-2 if isinstance(expected, str) else 1e-6
+            assert values[i] == pytest.approx(float(expected), rel=rel, abs=1e-7)
+
+
+# Tests that a negative base with a fractional exponent is an error like in evaluate_expression_safe.
+def test_evaluate_vectorized_negative_base():
+    np = pytest.importorskip("numpy")
+    compiled = math_logic.compile_expression("x ^ y", ("x", "y"))
+    values, errors = math_logic.evaluate_vectorized(compiled, np.array([-8.0, -8.0, 8.0]), np.array([0.5, 2.0, 0.5]))
+    assert math_logic.VECTOR_ERROR_MESSAGES[errors[0]] == math_logic.evaluate_expression_safe("(0 - 8) ^ 0.5")
+    assert np.isnan(values[0])
+    assert list(errors[1:]) == [math_logic.VECTOR_OK, math_logic.VECTOR_OK]
+    assert list(values[1:]) == pytest.approx([64.0, 8.0 ** 0.5])
+
+
+# Tests that batch evaluation preserves order and reports errors per item.
+@pytest.mark.parametrize("min_parallel", [10 ** 6, 0])
+def test_evaluate_many(min_parallel):
+    expressions = ["1 + 2", "1 / 0", "2 ^", "10 ^ 400", "3!", "0√4"] * 5
+    expected = [3, math_logic.ERROR_DIVISION_BY_ZERO, math_logic.ERROR_INVALID_EXPRESSION,
+                math_logic.ERROR_OVERFLOW, 6, math_logic.ERROR_DIVISION_BY_ZERO] * 5
+    results = math_logic.evaluate_many(expressions, workers=2, chunksize=4, min_parallel=min_parallel)
+    assert results == expected
+
+
+# Tests that the factorial memo is limited by the size of the remembered results.
+def test_factorial_memo_size():
+    memo = math_logic._factorial_memo
+    maxsize = memo.maxsize
+    try:
+        memo.resize(100000)
+        memo.clear()
+        for n in (10, 20000, 30000):
+            assert math_logic.factorial(n) == math.factorial(n)
+        assert len(memo) == 3
+        # 40000! takes about 69 kB, so the least recently used results are evicted
+        assert math_logic.factorial(10) == math.factorial(10)
+        assert math_logic.factorial(40000) == math.factorial(40000)
+        assert memo.get(20000) is None and memo.get(30000) is None
+        assert memo.get(10) == math.factorial(10) and memo.get(40000) == math.factorial(40000)
+        assert memo.evictions == 2
+        # A result larger than the whole memo is not remembered
+        math_logic.factorial(60000)
+        assert memo.get(60000) is None and len(memo) == 2
+    finally:
+        memo.resize(maxsize)
+        memo.clear()
+
+
+# Tests factorials of large and computed arguments and formatting of huge results.
+@pytest.mark.parametrize("expression, expected", [
+    ("20!", "2.43e+18"),
+    ("(3!)!", 720),
+    ("3!!", 720),
+    ("200!", "7.89e+374"),
+    ("1000!", "4.02e+2567"),
+    ("20000!", "1.82e+77337"),
+])
+def test_large_factorial(expression, expected):
+    assert evaluate_expression(expression) == expected
+
+
+# Tests scientific formatting of big integers without float conversion.
+@pytest.mark.parametrize("value", [10 ** 11, 123456789 ** 20, 2 ** 1000, 3 ** 700, 999 * 10 ** 400])
+def test_format_scientific(value):
+    from decimal import Decimal
+    assert math_logic.format_scientific(value) == format(Decimal(value), '.2e')
+
+
+# Tests that instrumentation reports stage metrics and can be switched off again.
+def test_instrumentation():
+    records = []
+    math_logic.clear_cache()
+    previous = math_logic.set_instrumentation(records.append)
+    try:
+        assert evaluate_expression("2 - (1 + 2) * 3!") == -16
+        assert evaluate_expression("2-(1+2)*3!") == -16
+        with pytest.raises(IndexError):
+            evaluate_expression("1 +")
+    finally:
+        math_logic.set_instrumentation(previous)
+    evaluate_expression("1 + 1")
+    assert len(records) == 3
+    first, second, failed = records
+    assert not first["cache_hit"] and second["cache_hit"]
+    assert first["tokens"] == 10 and second["tokens"] is None
+    assert first["operators"] == {'+': 1, '*': 1, '!': 1, '-': 1}
+    assert first["peak_stack_depth"] == 3
+    assert first["result"] == -16
+    assert first["total_time"] >= first["evaluate_time"] >= 0
+    assert isinstance(failed["error"], IndexError)
+
+
+# Tests that evaluation through the expression DAG matches plain postfix evaluation.
+@pytest.mark.parametrize("expression", [
+    "(2 ^ 30 + 7) * (2 ^ 30 + 7)",
+    "3! * 1 + 3! + 0",
+    "200! * 1",
+    "1 / 0 + 1 / 0",
+    "(2 - 3)! + 1 / 0",
+    "10 ^ 400 + 1 / 0",
+    "2√(0 - 4) * 1",
+    "0 - 0 + 1 - 0",
+    "5 ^ 1 / 1",
+    "1 2",
+    "2 ^ 3 ^ 2 + 2 ^ 3 ^ 2",
+])
+def test_optimized_evaluation(expression):
+    try:
+        expected = evaluate_expression(expression)
+    except Exception as error:
+        with pytest.raises(type(error)):
+            evaluate_expression(expression, optimize=True)
+    else:
+        assert evaluate_expression(expression, optimize=True) == expected
+
+
+# Tests hash-consing and constant folding of the expression DAG.
+def test_expression_dag():
+    postfix = math_logic.infix_to_postfix(math_logic.tokenize("(x + 1) * (x + 1) * 1 + 2 * 3", ("x",)))
+    dag = math_logic.ExpressionDAG(postfix)
+    operators = [node[0] for node in dag.nodes if node[0] not in (math_logic.NUMBER, math_logic.VARIABLE)]
+    assert sorted(operators) == ['*', '+', '+']
+    assert dag.evaluate({"x": 2}) == 15
+    compiled = math_logic.compile_expression("(x + 1) * (x + 1) * 1 + 2 * 3", ("x",))
+    assert compiled.source.count("=") == 3
+    assert compiled(2) == 15
+
+
+# Tests that the live preview follows typing and deleting like a full evaluation.
+def test_incremental_evaluator():
+    evaluator = math_logic.IncrementalEvaluator()
+    typed = ""
+    for chunk in ["1", "2", " + ", "3", " * ", "(", "4", " - ", "1", ")", "! ", " / ", "0", ".", "5"]:
+        typed += chunk
+        preview = evaluator.update(typed)
+        try:
+            expected = evaluate_expression(typed + ")" * (typed.count("(") - typed.count(")")))
+        except IndexError:
+            expected = None
+        assert preview == expected, typed
+    assert evaluator.update("12 + 3 * (4 - 1)! / 0") == math_logic.ERROR_DIVISION_BY_ZERO
+    assert evaluator.update("12 + 3 * (4 - 1)! / ") is None
+    assert evaluator.update("12 + 3 * (4") == 24
+    assert evaluator.update("12 + 3 * (4 - 1)) * 2") is None
+    assert evaluator.update("2√16") == 4
+    assert evaluator.update("") is None
+
+
+# Tests that edits in the middle of an expression keep the preview of a full evaluation.
+def test_incremental_evaluator_edits():
+    rng = random.Random(4)
+    evaluator = math_logic.IncrementalEvaluator()
+    text = " + ".join(f"{i} * 3" for i in range(200))
+    assert evaluator.update(text) == evaluate_expression(text)
+    for _ in range(50):
+        position = rng.randrange(len(text))
+        text = text[:position] + rng.choice("0123456789") + text[position + 1:]
+        assert evaluator.update(text) == evaluate_expression(text), text
+    for old, new in [("", "12"), ("12", ""), ("123", "124"), ("1234", "12"), ("12", "1234"), ("9+1", "8+1")]:
+        assert math_logic._common_prefix_length(old, new) == len(os.path.commonprefix((old, new)))
+
+
+# Tests the estimated number of result digits against the digits of the exact results.
+@pytest.mark.parametrize("operator, operands, digits", [
+    ('!', (100.0,), 158),
+    ('!', (2.5,), 0),
+    ('*', (10 ** 50, 10 ** 30), 81),
+    ('^', (6, 362880), 282376),
+    ('^', (2.0, 1000.0), 0),
+])
+def test_estimate_result_digits(operator, operands, digits):
+    estimate = math_logic.estimate_result_digits(operator, operands)
+    assert digits <= estimate <= digits * 1.01 + 1
+
+
+# Tests that a budget stops costly operations before they run, or approximates them.
+def test_evaluation_budget():
+    budget = math_logic.EvaluationBudget(max_digits=1000)
+    assert evaluate_expression("99999!", budget=budget) == math_logic.ERROR_BUDGET
+    assert evaluate_expression("(3!) ^ (9!)", budget=math_logic.EvaluationBudget(max_memory=10 ** 4)) == \
+        math_logic.ERROR_BUDGET
+    assert evaluate_expression("(10!) ^ (10!)", budget=math_logic.EvaluationBudget(max_seconds=1)) == \
+        math_logic.ERROR_BUDGET
+    assert evaluate_expression("100! + 2√16", budget=budget) == evaluate_expression("100! + 2√16")
+    assert evaluate_expression("(2 - 3)!", budget=budget) == math_logic.ERROR_FACTORIAL
+
+    approximate = math_logic.EvaluationBudget(max_digits=100, approximate=True)
+    assert evaluate_expression("100!", budget=approximate) == "9.33e+157"
+    assert evaluate_expression("171!", budget=approximate) == math_logic.ERROR_BUDGET
+    evaluator = math_logic.IncrementalEvaluator(approximate)
+    assert evaluator.update("99999!") == math_logic.ERROR_BUDGET
+    assert evaluator.update("99") == 99
+
+
+# Tests that opcode programs evaluate like the postfix lists they are compiled from.
+@pytest.mark.parametrize("expression", [
+    "12 + 3 * 4 / 2",
+    "2 ^ 3 ^ 2 - 3√27 + 2√16",
+    "5! / 3! + 50%",
+    "1 / 0",
+    "(2 - 3)!",
+    "2√(0 - 4)",
+    "1 2",
+])
+def test_postfix_program(expression):
+    postfix = math_logic.infix_to_postfix(math_logic.tokenize(math_logic.normalize_expression(expression)))
+    program = math_logic.compile_postfix(postfix)
+    assert program.postfix() == postfix
+    assert program.evaluate() == math_logic.evaluate_postfix(postfix)
+    assert program.nbytes == len(postfix) + 8 * sum(token.__class__ is float for token in postfix)
+
+
+# Tests that postfix lists with variables, integers or parentheses are not compiled.
+def test_postfix_program_invalid():
+    with pytest.raises(ValueError):
+        math_logic.compile_postfix(math_logic.infix_to_postfix(math_logic.tokenize("x + 1", ("x",))))
+    with pytest.raises(ValueError):
+        math_logic.compile_postfix(["(", 1.0])
+
+
+# Tests that streamed evaluation and postfix generation match the serial pipeline for any chunk size.
+@pytest.mark.parametrize("expression", [
+    "12 + 3 × (4 - 1)! ÷ 0.5",
+    "2e+3 * 1.5e-2 - 7.",
+    "2 ^ 3 ^ 2 - 3√27 + 2√16",
+    "5! / 3! + 50%",
+    "(1 + 2",
+    "1 / 0",
+])
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 16])
+def test_evaluate_streaming(expression, chunk_size):
+    expected = evaluate_expression(expression)
+    assert math_logic.evaluate_streaming(expression) == expected
+    assert math_logic.evaluate_streaming(io.StringIO(expression), chunk_size=chunk_size) == expected
+    assert list(math_logic.iter_postfix(math_logic.iter_tokens(io.StringIO(expression), chunk_size))) == \
+        math_logic.infix_to_postfix(math_logic.tokenize(math_logic.normalize_expression(expression)))
+
+
+
+class _CountingReader(io.StringIO):
+    # Counts the characters read, to measure how far reading is ahead of the tokens
+    consumed = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.consumed += len(chunk)
+        return chunk
+
+
+# Tests that a whitespace-free sum is tokenized as it streams in, only a few chunks behind reading.
+@pytest.mark.parametrize("separator", ["+", "-", " + "])
+def test_iter_tokens_bounded(separator):
+    expression = separator.join(["12", "3.5e+2", "4e-1", "7."] * 5000)
+    source = _CountingReader(expression)
+    count = 0
+    for kind, value, position in math_logic.iter_tokens(source, chunk_size=64):
+        assert source.consumed - position <= 2 * 64
+        count += 1
+    assert count == len(math_logic.tokenize(expression))
+    assert math_logic.evaluate_streaming(io.StringIO(expression), chunk_size=5) == evaluate_expression(expression)
+
+# Tests that splitting at top-level terms gives the same results as serial evaluation.
+@pytest.mark.parametrize("expression", [
+    "1 + 2 * 3 - 4 / 8 + 5! - 2 ^ 10 + 0.1 + 0.2 + 0.3",
+    "(1 + 2) * (3 - 4) * 2√16 * 3! * 1.5 * 7",
+    "((1 + 2 + 3 + 4 + 5 + 6 + 7 + 8))",
+    "1 + 2 + 3 / 0 + 4 + 5 + 10 ^ 400",
+    "1 + 2 * 3 + 4 % + 5 + 6",
+    "1 - -2 + 3 * -4 - 5 + 6 - 7",
+    "2 ^ 3 ^ 2 - 3√27 + (2 - 3)! + 8 - 9",
+    "1 + 2 + (3 * 4 + 5 - 6",
+    "0 / ^ 2 - 1 + 2",
+    "2 * 3 + ! 4 + 5",
+])
+def test_evaluate_parallel(expression):
+    def outcome(function, *args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        except Exception as error:
+            return type(error)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        result = outcome(math_logic.evaluate_parallel, expression, workers=4, executor=executor, min_length=0)
+    assert result == outcome(evaluate_expression, expression)
+
+
+# Tests that expressions whose terms depend on each other are not split, so no piece
+# dispatched to the workers has to be evaluated again serially.
+@pytest.mark.parametrize("expression, chain", [
+    ("1 + 2 * 3 - 4 / 8 + 5!", '+'),
+    ("(1 + 2) * (3 - 4) * 2√16 * 3!", '*'),
+    ("((1 + 2 + 3 + 4))", '+'),
+    ("1e+5 * 2.5e-3 * (1 - 2) * 3.", '*'),
+    ("2 ^ 3 ^ 2 - 3√27 + (2 - 3)! + 8", '+'),
+    ("1 - -2 + 3", None),
+    ("-1 + 2 + 3", None),
+    ("1 + 2 * -3 + 4", None),
+    ("1 + 2 % + 3", None),
+    ("2 * 3 / 4 * 5", None),
+    ("3! - 2 + 1", None),
+    ("1 + 2 + (3 * 4 + 5", None),
+    ("1 + 2) + (3", None),
+    ("√4 + 5 + 6", None),
+    ("2 ^ 10", None),
+])
+def test_split_pieces(expression, chain):
+    pieces, split_chain = math_logic._split_pieces(math_logic.normalize_expression(expression), 8)
+    assert split_chain == chain
+    assert len(pieces) > 1 if chain else len(pieces) == 1
+    if chain:
+        assert all(math_logic._evaluate_piece(piece, chain) is not None for piece in pieces)
+        assert math_logic._combine_terms([math_logic._evaluate_piece(piece, chain) for piece in pieces]) == \
+            evaluate_expression(expression)
@@ -0,0 +1,37 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: Test module for the cli module. Contains test cases for the streaming batch mode.
+
+@file cli_test.py
+@date 2026-10-18
+"""
+
+import io
+
+import pytest
+
+import math_logic
+from cli import evaluate_stream
+
+
+# Tests that results are written in input order, one per line, for in-process and pooled evaluation.
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("chunk_size", [1, 3, 10000])
+def test_evaluate_stream(workers, chunk_size):
+    expressions = [f"{i} * 2 + {i} ^ 2" for i in range(50)] + ["1 / 0", "2 ^", "", "3!\r"]
+    lines = [f"{expression}\n" for expression in expressions]
+    output = io.StringIO()
+    count, characters = evaluate_stream(iter(lines), output, workers=workers, chunk_size=chunk_size)
+    assert count == len(lines)
+    assert characters == sum(map(len, lines))
+    expected = [math_logic.evaluate_expression_safe(expression.rstrip('\r')) for expression in expressions]
+    assert output.getvalue() == ''.join(f"{result}\n" for result in expected)
+
+
+# Tests that a budget is applied to every line.
+def test_evaluate_stream_budget():
+    output = io.StringIO()
+    budget = math_logic.EvaluationBudget(max_digits=10)
+    evaluate_stream(["2 ^ 10\n", "30!\n"], output, budget=budget)
+    assert output.getvalue() == f"1024\n{math_logic.ERROR_BUDGET}\n"
@@ -0,0 +1,14 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: Test configuration. The command line modules import their siblings as top-level
+modules (they are run from src/), so src/ is put on the module search path.
+
+@file conftest.py
+@date 2026-10-18
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
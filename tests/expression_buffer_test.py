@@ -0,0 +1,48 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: Test module for the expression_buffer module. Contains test cases for tracking the
+changed tail of the display and filtering pasted text.
+
+@file expression_buffer_test.py
+@date 2026-10-18
+"""
+
+import pytest
+
+from expression_buffer import ExpressionBuffer, sanitize_pasted
+
+
+# Tests that the display buffer tracks the changed tail of the expression.
+def test_expression_buffer():
+    buffer = ExpressionBuffer("12")
+    assert buffer.tail(buffer.dirty) == "12"
+    buffer.mark_rendered()
+    for piece in [" + ", "2√", "9", "! "]:
+        buffer.append(piece)
+    assert buffer.text == "12 + 2√9! "
+    assert buffer.dirty == 2
+    assert buffer.tail(4) == " 2√9! "
+    assert buffer.last_character() == "!"
+    buffer.mark_rendered()
+    assert buffer.pop() == "! "
+    assert buffer.pop() == "9"
+    assert buffer.dirty == len(buffer) == 7
+    assert buffer.tail(buffer.dirty) == ""
+    buffer.clear()
+    assert buffer.text == "" and buffer.last_character() == "" and buffer.pop() == ""
+
+
+# Tests filtering pasted text into a piece of an expression.
+@pytest.mark.parametrize("text, piece", [
+    ("12 × (3 ÷ 4)", "12 * (3 / 4)"),
+    ("  1 +\n2\r\n- 3\t", "1 + 2 - 3"),
+    ("= 2^10 + 3√27;", "2^10 + 3√27"),
+    ("1.5e+3 * 50%", "1.5e+3 * 50%"),
+])
+def test_sanitize_pasted(text, piece):
+    assert sanitize_pasted(text) == piece
+    buffer = ExpressionBuffer("7 + ")
+    buffer.append(piece)
+    assert buffer.pop() == piece and buffer.text == "7 + "
+    assert sanitize_pasted("xyz\n") == ""
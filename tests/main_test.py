@@ -0,0 +1,54 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: Test module for the main module. Contains test cases for the headless eval command.
+
+@file main_test.py
+@date 2026-10-18
+"""
+
+import pytest
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(tmp_path, monkeypatch):
+    # Keeps the persistent result cache of the tests out of the user cache directory
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "cache"))
+
+
+# Tests evaluating expressions, with the options in any order.
+@pytest.mark.parametrize("argv", [
+    ["eval", "1 + 2", "3!"],
+    ["eval", "--no-cache", "1 + 2", "3!"],
+    ["eval", "1 + 2", "3!", "--no-cache"],
+])
+def test_eval_expressions(capsys, argv):
+    assert main.main(argv) == 0
+    assert capsys.readouterr().out == "3\n6\n"
+
+
+# Tests evaluating the expression of a file streamed or split over workers, with the options in any order.
+@pytest.mark.parametrize("options", [
+    ["--file", "{path}"],
+    ["--no-cache", "--file", "{path}"],
+    ["--file", "{path}", "-j", "2"],
+    ["-j", "2", "--no-cache", "--file", "{path}"],
+])
+def test_eval_file(tmp_path, capsys, options):
+    path = tmp_path / "expression.txt"
+    path.write_text("1 + 2 * 3 - 4 / 8\n")
+    assert main.main(["eval"] + [option.format(path=path) for option in options]) == 0
+    assert capsys.readouterr().out == "6.5\n"
+
+
+# Tests that failing expressions set the exit status and invalid arguments are rejected.
+def test_eval_errors(tmp_path, capsys):
+    assert main.main(["eval", "--no-cache", "1 / 0", "--", "-1 + 2"]) == 1
+    assert capsys.readouterr().out == "Error: Division by zero\n1\n"
+    for argv in (["eval", "-j", "2", "1 + 1"], ["eval", "--file", "x", "1 + 1"], ["eval", "-j", "0", "--file", "x"],
+                 ["unknown"]):
+        with pytest.raises(SystemExit) as exit_info:
+            main.main(argv)
+        assert exit_info.value.code == 2
@@ -0,0 +1,298 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: Test module for the profiling module. Contains test cases for the one-pass
+statistics, the quantile summaries, the loading of numbers and the profiling harness.
+
+@file profiling_test.py
+@date 2026-10-18
+"""
+
+import bisect
+import io
+import pstats
+import random
+import statistics
+import struct
+import time
+
+import pytest
+
+import profiling
+
+
+# Tests the one-pass deviation on a large offset with a small variance, where the naive formula fails.
+def test_sample_std_deviation_large_offset():
+    rng = random.Random(6)
+    # The sum of squares formula gives a negative variance for these numbers
+    nums = [1e9 + rng.random() for _ in range(100000)]
+    expected = statistics.stdev(nums)
+    assert profiling.calculate_sample_std_deviation(iter(nums)) == pytest.approx(expected, rel=1e-6)
+    assert profiling.RunningStatistics.from_values(nums).sample_std_deviation() == pytest.approx(expected, rel=1e-6)
+    with pytest.raises(ValueError):
+        profiling.calculate_sample_std_deviation([1.0])
+
+
+# Tests reading numbers lazily from a stream with blank lines and several numbers per line.
+def test_read_input_numbers():
+    stream = io.StringIO("1 2.5\n\n   \n-3e2\t4\n\n5\n")
+    numbers = profiling.read_input_numbers(stream)
+    assert next(numbers) == 1.0
+    assert list(numbers) == [2.5, -300.0, 4.0, 5.0]
+    stream.seek(0)
+    assert profiling.calculate_sample_std_deviation(profiling.read_input_numbers(stream)) == \
+        pytest.approx(statistics.stdev([1, 2.5, -300, 4, 5]))
+
+
+def _write_numbers(path, count=2000, seed=7):
+    rng = random.Random(seed)
+    nums = [round(rng.uniform(-1e4, 1e4), rng.randint(0, 6)) for _ in range(count)]
+    separators = [' ', '\n', '  ', '\t', ' \n']
+    path.write_text(''.join(f"{num!r}{rng.choice(separators)}" for num in nums[:-1]) + repr(nums[-1]))
+    return nums
+
+
+# Tests that file ranges end at whitespace, so no number is cut, and cover the whole file.
+@pytest.mark.parametrize("parts", [1, 2, 3, 7, 50])
+def test_split_file(tmp_path, parts):
+    path = tmp_path / "numbers.txt"
+    nums = _write_numbers(path)
+    data = path.read_bytes()
+    ranges = profiling.split_file(str(path), parts)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert all(data[end:end + 1].isspace() for _, end in ranges[:-1])
+    assert [float(part) for start, end in ranges for part in data[start:end].split()] == nums
+
+
+# Tests merging the statistics of file ranges read in blocks that cut numbers.
+@pytest.mark.parametrize("block_size", [1, 7, 64, 1 << 24])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_sample_std_deviation(tmp_path, monkeypatch, block_size, workers):
+    monkeypatch.setattr(profiling, 'READ_BLOCK_SIZE', block_size)
+    path = tmp_path / "numbers.txt"
+    nums = _write_numbers(path)
+    stats = profiling.RunningStatistics()
+    for start, end in profiling.split_file(str(path), 5):
+        stats.merge(profiling.RunningStatistics.from_state(profiling.chunk_statistics(str(path), start, end)))
+    assert stats.count == len(nums)
+    assert stats.mean == pytest.approx(statistics.mean(nums))
+    assert stats.sample_std_deviation() == pytest.approx(statistics.stdev(nums))
+    assert profiling.parallel_sample_std_deviation(str(path), workers) == pytest.approx(statistics.stdev(nums))
+
+
+# Tests that merging accumulators equals accumulating the concatenation.
+def test_running_statistics_merge():
+    rng = random.Random(8)
+    first = [rng.gauss(5, 2) for _ in range(1000)]
+    second = [rng.gauss(-3, 0.5) for _ in range(300)]
+    merged = profiling.RunningStatistics().update(first).merge(profiling.RunningStatistics().update(second))
+    whole = profiling.RunningStatistics().update(first + second)
+    assert merged.count == whole.count
+    assert merged.mean == pytest.approx(whole.mean)
+    assert merged.m2 == pytest.approx(whole.m2)
+    assert profiling.RunningStatistics().merge(merged).state() == merged.state()
+    assert merged.merge(profiling.RunningStatistics()).state() == merged.state()
+
+
+QUANTILES = [i / 100 for i in range(101)]
+
+
+def _sketch(nums, k, seed, block=1000):
+    sketch = profiling.QuantileSketch(k, seed)
+    for start in range(0, len(nums), block):
+        sketch.update(nums[start:start + block])
+    return sketch
+
+
+def _rank_error(ordered, quantiles):
+    # Largest distance of a quantile rank from the ranks of its reported value, relative to the count
+    count = len(ordered)
+    error = 0
+    for q, value in zip(QUANTILES, quantiles):
+        lowest = bisect.bisect_left(ordered, value)
+        highest = bisect.bisect_right(ordered, value)
+        error = max(error, lowest - q * count, q * count - highest)
+    return error / count
+
+
+# Tests that the sketch keeps the rank error within about 1/k on uniform and sorted streams.
+@pytest.mark.parametrize("k", [50, 200])
+@pytest.mark.parametrize("stream", ["uniform", "sorted"])
+def test_quantile_sketch_rank_error(k, stream):
+    rng = random.Random(k)
+    nums = [rng.random() for _ in range(100000)]
+    if stream == "sorted":
+        nums.sort()
+    sketch = _sketch(nums, k, seed=1)
+    assert sketch.count == len(nums)
+    assert len(sketch) < 4 * k + 1000
+    assert _rank_error(sorted(nums), sketch.quantiles(QUANTILES)) <= 1.5 / k
+
+
+# Tests that merging sketches of parts of a stream keeps the accuracy of one sketch of the whole.
+def test_quantile_sketch_merge():
+    rng = random.Random(9)
+    nums = [rng.gauss(0, 1) for _ in range(100000)]
+    merged = profiling.QuantileSketch(100, seed=1)
+    for part in range(4):
+        merged.merge(_sketch(nums[part * 25000:(part + 1) * 25000], 100, seed=part))
+    assert merged.count == len(nums)
+    assert _rank_error(sorted(nums), merged.quantiles(QUANTILES)) <= 1.5 / 100
+    # Without compactions the sketches hold every number, so merging is exact
+    small = profiling.QuantileSketch(100).update(nums[:30]).merge(profiling.QuantileSketch(100).update(nums[30:60]))
+    assert small.quantiles(QUANTILES) == profiling.QuantileSketch(100).update(nums[:60]).quantiles(QUANTILES)
+    whole = profiling.StreamSummary(100, seed=1).update(nums)
+    parts = profiling.StreamSummary(100, seed=1).update(nums[:30000]).merge(
+        profiling.StreamSummary(100, seed=2).update(nums[30000:]))
+    assert (parts.minimum, parts.maximum, parts.moments.count) == (whole.minimum, whole.maximum, whole.moments.count)
+    assert parts.moments.mean == pytest.approx(whole.moments.mean)
+    assert parts.quantiles([0, 1]) == [min(nums), max(nums)]
+
+
+# Tests exact quantiles against linear interpolation between the sorted numbers, with and without NumPy.
+@pytest.mark.parametrize("numpy", [True, False])
+@pytest.mark.parametrize("count", [1, 2, 5, 1000])
+def test_exact_quantiles(monkeypatch, numpy, count):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(profiling, 'np', None)
+    rng = random.Random(count)
+    values = [rng.uniform(-100, 100) for _ in range(count)]
+    ordered = sorted(values)
+    expected = []
+    for q in QUANTILES:
+        position = q * (count - 1)
+        rank = int(position)
+        upper = ordered[min(rank + 1, count - 1)]
+        expected.append(ordered[rank] + (position - rank) * (upper - ordered[rank]))
+    original = list(values)
+    assert profiling.exact_quantiles(values, QUANTILES) == pytest.approx(expected)
+    # The numbers are selected in a copy, the input keeps its order
+    assert values == original
+
+
+# Tests that summaries of no numbers are rejected and a single number is every quantile.
+@pytest.mark.parametrize("exact", [False, True])
+def test_summarize_empty_and_single(exact):
+    with pytest.raises(ValueError):
+        profiling.summarize([], exact=exact)
+    with pytest.raises(ValueError):
+        profiling.summarize(iter([]), exact=exact)
+    summary = profiling.summarize(iter([4.5]), exact=exact)
+    assert summary['count'] == 1 and summary['std'] is None
+    assert summary['mean'] == summary['min'] == summary['max'] == summary['median'] == 4.5
+    assert set(summary['percentiles'].values()) == {4.5}
+    with pytest.raises(ValueError):
+        profiling.QuantileSketch().quantiles([0.5])
+    with pytest.raises(ValueError):
+        profiling.exact_quantiles([], [0.5])
+    assert profiling.QuantileSketch().update([4.5]).quantiles([0, 0.5, 1]) == [4.5, 4.5, 4.5]
+
+
+# Tests loading text in blocks that cut numbers, with and without NumPy.
+@pytest.mark.parametrize("numpy", [True, False])
+@pytest.mark.parametrize("block_size", [1, 5, 1 << 24])
+def test_load_numbers_text(tmp_path, monkeypatch, numpy, block_size):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(profiling, 'np', None)
+    monkeypatch.setattr(profiling, 'READ_BLOCK_SIZE', block_size)
+    path = tmp_path / "numbers.txt"
+    nums = _write_numbers(path, count=300)
+    assert list(profiling.load_numbers(str(path))) == nums
+    monkeypatch.setattr('sys.stdin', io.TextIOWrapper(io.BytesIO(path.read_bytes())))
+    assert list(profiling.load_numbers('-')) == nums
+
+
+# Tests memory-mapped and piped raw float64 input, and rejecting a partial value.
+@pytest.mark.parametrize("numpy", [True, False])
+def test_load_numbers_f64(tmp_path, monkeypatch, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(profiling, 'np', None)
+    nums = [1.5, -2.25, 1e300, 0.0]
+    data = struct.pack('<4d', *nums)
+    path = tmp_path / "numbers.f64"
+    path.write_bytes(data)
+    assert list(profiling.load_numbers(str(path), 'f64')) == nums
+    monkeypatch.setattr('sys.stdin', io.TextIOWrapper(io.BytesIO(data)))
+    assert list(profiling.load_numbers(None, 'f64')) == nums
+    path.write_bytes(b'')
+    assert len(profiling.load_numbers(str(path), 'f64')) == 0
+    path.write_bytes(data + b'\x00\x01\x02')
+    with pytest.raises(ValueError, match="multiple of 8"):
+        profiling.load_numbers(str(path), 'f64')
+    monkeypatch.setattr('sys.stdin', io.TextIOWrapper(io.BytesIO(data[:-1])))
+    with pytest.raises(ValueError, match="multiple of 8"):
+        profiling.load_numbers('-', 'f64')
+    with pytest.raises(ValueError):
+        profiling.load_numbers(str(path), 'csv')
+
+
+def _busy(seconds):
+    # Sleeps in short steps, so the sampler thread gets the GIL
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        time.sleep(0.001)
+
+
+# Tests that sampled stacks start at the root and convert to collapsed stacks and pstats.
+def test_stack_sampler():
+    sampler = profiling.StackSampler(0.001, root=_busy.__code__)
+    assert sampler.stats == {}
+    with sampler:
+        _busy(0.2)
+    samples = sum(sampler.stacks.values())
+    assert samples > 0 and sampler.seconds >= 0.2
+    assert all(stack[0][2] == '_busy' for stack in sampler.stacks)
+    lines = sampler.collapsed().splitlines()
+    assert len(lines) == len(sampler.stacks)
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == samples
+    assert all(line.startswith("_busy (profiling_test.py:") for line in lines)
+    stats = pstats.Stats(sampler)
+    root = next(function for function in stats.stats if function[2] == '_busy')
+    calls, _, own, total, callers = stats.stats[root]
+    assert calls == samples and not callers
+    assert total == pytest.approx(sampler.seconds)
+    assert sum(entry[2] for entry in stats.stats.values()) == pytest.approx(sampler.seconds)
+
+
+# Tests comparing written profiles of two runs.
+@pytest.mark.parametrize("sampling", [False, True])
+def test_compare_profiles(tmp_path, capsys, sampling):
+    prefixes = []
+    for size in (10000, 30000):
+        result = profiling.profile_entry_point('evaluate_expression', ["+".join(["2*3"] * size)], sampling=sampling)
+        prefix = str(tmp_path / f"run{size}")
+        paths = profiling.write_profile(result, prefix)
+        assert (prefix + '.collapsed' in paths) == sampling
+        prefixes.append(prefix + '.pstats')
+    totals, rows = profiling.compare_profiles(*prefixes, top=3)
+    assert len(totals) == 2 and len(rows) <= 3
+    assert all(isinstance(label, str) and first >= 0 and second >= 0 for label, first, second in rows)
+    changes = [abs(second - first) for _, first, second in rows]
+    assert changes == sorted(changes, reverse=True)
+    assert profiling.profile_main(['compare', *prefixes, '--sort', 'cumtime']) == 0
+    assert "total profiled seconds" in capsys.readouterr().out
+
+
+# Tests that only entry points taking prepared expressions are profiled and failures are reported.
+def test_entry_point(capsys):
+    function, prepare = profiling.entry_point('evaluate_postfix')
+    assert function(prepare("1 + 2 * 3")) == 7
+    assert profiling.entry_point('evaluate_expression')[1]("2^3") == "2^3"
+    for name in ('plus', '_evaluate_term', 'NUMBER', 'missing'):
+        with pytest.raises(ValueError, match="Unknown math_logic entry point"):
+            profiling.entry_point(name)
+    with pytest.raises(ValueError, match="failed on its input"):
+        profiling.profile_entry_point('evaluate_postfix', ["1 + (2"])
+    with pytest.raises(ValueError, match="No stack samples"):
+        profiling.profile_entry_point('normalize_expression', ["1"], sampling=True, interval=1.0)
+    assert profiling.profile_main(['run', '-f', 'evaluate_postfix', '-e', "1 + (2"]) == 2
+    assert "evaluate_postfix failed on its input" in capsys.readouterr().err
+    assert profiling.profile_main(['run', '-f', 'evaluate_many', '-e', "1 + 2", '-e', "3!"]) == 0
+    assert "evaluate_many: 2 inputs" in capsys.readouterr().out
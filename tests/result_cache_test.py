@@ -0,0 +1,88 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: Test module for the result_cache module. Contains test cases for storing, evicting
+and sharing results of the persistent result cache.
+
+@file result_cache_test.py
+@date 2026-10-18
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from math_logic import div, evaluate_expression
+from result_cache import LOCK_TIMEOUT, ResultCache
+
+
+# Tests storing, restoring and evicting results of the persistent result cache.
+def test_result_cache(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    cache = ResultCache(path, min_seconds=0.5, max_bytes=100)
+    assert not cache.put("1+2", 3, 0.1)
+    assert cache.get("1+2") is None
+    results = {"200000!": "1.42e+973350", "2^0.5": 2 ** 0.5, "10^18": 10 ** 18, "1/0": "Error: Division by zero"}
+    for expression, result in results.items():
+        assert cache.put(expression, result, 1.0)
+    # Another instance, e.g. in another process, shares the stored results
+    other = ResultCache(path)
+    for expression, result in results.items():
+        restored = other.get(expression)
+        assert restored == result and type(restored) is type(result)
+    assert cache.put("3^1000", "1.32e+477", 1.0)
+    # The least recently used entry was evicted to stay within max_bytes
+    assert cache.get("200000!") is None
+    assert cache.info()['bytes'] <= 100
+    assert cache.evictions == 1
+
+
+# Tests that the result cache computes only uncached results and can be bypassed.
+def test_result_cache_evaluate(tmp_path):
+    calls = []
+
+    def slow(expression):
+        calls.append(expression)
+        return evaluate_expression(expression)
+
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), min_seconds=0)
+    assert cache.evaluate("2^10", slow, "2 ^ 10") == 1024
+    assert cache.evaluate("2^10", slow, "2 ^ 10") == 1024
+    assert calls == ["2 ^ 10"]
+    cache.enabled = False
+    assert cache.evaluate("2^10", slow, "2 ^ 10") == 1024
+    assert len(calls) == 2
+    with pytest.raises(ZeroDivisionError):
+        ResultCache(str(tmp_path / "results.sqlite3"), min_seconds=0).evaluate("1/0", div, 1, 0)
+
+
+# Tests that an unusable database makes the cache miss instead of failing.
+def test_result_cache_unusable(tmp_path):
+    path = tmp_path / "results.sqlite3"
+    path.write_bytes(b"not a database" * 100)
+    cache = ResultCache(str(path), min_seconds=0)
+    assert cache.evaluate("1+2", evaluate_expression, "1 + 2") == 3
+    assert cache.get("1+2") is None
+    assert cache.info()['size'] == 0
+
+
+# Tests that a hit is not delayed or lost while another process holds the write lock.
+def test_result_cache_locked(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    cache = ResultCache(path, min_seconds=0)
+    assert cache.put("10^18", 10 ** 18, 1.0)
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        assert cache.get("10^18") == 10 ** 18
+        assert time.perf_counter() - started < LOCK_TIMEOUT / 2
+        assert cache.hits == 1 and cache.misses == 0
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+    # The writer released the lock, so the next hit updates the usage time again
+    used = cache._connect().execute("SELECT used FROM results").fetchone()[0]
+    assert cache.get("10^18") == 10 ** 18
+    assert cache._connect().execute("SELECT used FROM results").fetchone()[0] > used
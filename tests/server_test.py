@@ -0,0 +1,115 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: Test module for the server module. Contains test cases for requests sent to a
+server listening on the loopback interface and on a Unix socket.
+
+@file server_test.py
+@date 2026-10-18
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import math_logic
+from server import EvaluationServer
+
+
+def _strict_constant(name):
+    raise ValueError(f"{name} is not valid JSON")
+
+
+async def _exchange(server, requests, unix_path=None):
+    # Sends request lines on one connection and returns the strictly parsed responses by
+    # order of arrival
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path, limit=1 << 24)
+    else:
+        host, port = server.addresses()[0][:2]
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 24)
+    for request in requests:
+        writer.write((request if isinstance(request, str) else json.dumps(request)).encode() + b'\n')
+    await writer.drain()
+    responses = [json.loads(await reader.readline(), parse_constant=_strict_constant) for _ in requests]
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+def _serve(requests, unix_path=None, **options):
+    async def run():
+        server = EvaluationServer(workers=1, **options)
+        if unix_path is not None:
+            await server.start(path=unix_path)
+        else:
+            await server.start('127.0.0.1', 0)
+        try:
+            return await _exchange(server, requests, unix_path), server.statistics()
+        finally:
+            await server.close()
+
+    return asyncio.run(run())
+
+
+# Tests single and batched expressions, including error messages.
+def test_server_expressions():
+    responses, stats = _serve([
+        {'id': 1, 'expression': "1 + 2"},
+        {'id': 2, 'expressions': ["2 ^ 3", "1 / 0", "2 ^"]},
+        {'expression': "3!"},
+    ])
+    by_id = {response.get('id'): response for response in responses}
+    assert by_id[1] == {'id': 1, 'result': 3}
+    assert by_id[2] == {'id': 2, 'results': [8, math_logic.ERROR_DIVISION_BY_ZERO,
+                                             math_logic.ERROR_INVALID_EXPRESSION]}
+    assert by_id[None] == {'result': 6}
+    assert stats['requests'] == 3 and stats['expressions'] == 5
+
+
+
+# Tests that infinite and NaN results are sent as strings, keeping the responses valid JSON.
+def test_server_non_finite_results():
+    responses, _ = _serve([
+        {'id': 1, 'expression': "0 - 1e308 * 10"},
+        {'id': 2, 'expressions': ["1e308 * 10 - 1e308 * 10", "1e308 * 10", "2 * 3"]},
+    ])
+    by_id = {response['id']: response for response in responses}
+    assert by_id[1]['result'] == "-inf"
+    assert by_id[2]['results'] == ["nan", "inf", 6]
+
+# Tests the statistics command over a Unix socket.
+def test_server_stats(tmp_path):
+    responses, _ = _serve([{'id': 'a', 'expression': "2 * 2"}], unix_path=str(tmp_path / "server.sock"))
+    assert responses == [{'id': 'a', 'result': 4}]
+    responses, _ = _serve([{'id': 7, 'command': 'stats'}], unix_path=str(tmp_path / "server.sock"))
+    stats = responses[0]['stats']
+    assert responses[0]['id'] == 7
+    assert stats['workers'] == 1 and stats['queue_depth'] == 0 and stats['in_flight'] == 0
+
+
+# Tests that malformed requests are answered with an error and do not close the connection.
+def test_server_malformed_requests():
+    responses, _ = _serve(["{not json", "[1, 2]", {'id': 3, 'expression': 12}, {'id': 4, 'expression': "5 - 1"}])
+    errors = [response['error'] for response in responses if 'error' in response]
+    assert sorted(errors) == sorted(["Invalid JSON", "Request must be an object",
+                                     "Expected 'expression', 'expressions' or 'command'"])
+    assert {'id': 4, 'result': 4} in responses
+
+
+# Tests that a request over the size limit is rejected and the following requests are still answered.
+@pytest.mark.parametrize("size", [3000, 200000])
+def test_server_request_too_large(size):
+    long_expression = " + ".join(["1"] * (size // 4))
+    responses, _ = _serve([{'id': 1, 'expression': long_expression}, {'id': 2, 'expression': "1 + 1"}],
+                          request_limit=1024)
+    assert {'error': "Request too large"} in responses
+    assert {'id': 2, 'result': 2} in responses
+
+
+# Tests that long expressions fit under the default limit.
+def test_server_long_expression():
+    long_expression = " + ".join(["2"] * 30000)
+    responses, _ = _serve([{'id': 1, 'expression': long_expression}])
+    assert responses == [{'id': 1, 'result': 60000}]
@@ -0,0 +1,62 @@
+"""
+IVS Project 2 - Golden Calculator
+
+@brief: Test module for the worker module. Contains test cases for evaluating in and
+cancelling a background process.
+
+@file worker_test.py
+@date 2026-10-18
+"""
+
+import time
+
+import pytest
+
+from worker import EvaluationWorker
+
+
+def _wait(worker, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        outcome = worker.poll()
+        if outcome is not None:
+            return outcome
+        time.sleep(0.01)
+    raise AssertionError("The worker did not finish in time.")
+
+
+@pytest.fixture
+def worker():
+    worker = EvaluationWorker()
+    yield worker
+    worker.close()
+
+
+# Tests that results and exceptions of the background evaluation are reported.
+def test_worker_result_and_exception(worker):
+    worker.submit("1 + 2 * 3")
+    assert worker.busy
+    with pytest.raises(RuntimeError):
+        worker.submit("1 + 1")
+    assert _wait(worker) == (True, 7)
+    assert not worker.busy and worker.elapsed() == 0.0
+    worker.submit("2 ^")
+    succeeded, error = _wait(worker)
+    assert not succeeded and isinstance(error, Exception)
+    # The process is reused after an exception
+    worker.submit("4!")
+    assert _wait(worker) == (True, 24)
+
+
+# Tests cancelling a long computation and evaluating in the replacement process.
+def test_worker_cancel(worker):
+    worker.submit("300000!")
+    time.sleep(0.2)
+    assert worker.poll() is None and worker.busy
+    process = worker._process
+    worker.cancel()
+    assert not worker.busy and not process.is_alive()
+    assert worker.poll() is None
+    worker.start()
+    worker.submit("2 ^ 10")
+    assert _wait(worker) == (True, 1024)